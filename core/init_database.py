@@ -1,7 +1,13 @@
-from utilities.database import create_table_schema, connect_to_database
+import os
+import sys
+
+# Allow running as "python3 core/init_database.py" from the RetroSpin directory
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.utilities.database import create_table_schema, connect_to_database
 
 #Creating database
 conn, cursor = connect_to_database()
 create_table_schema(cursor)
+conn.commit()
 
 # Populate with active systems. This will control entire program
\ No newline at end of file
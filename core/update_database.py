@@ -1,126 +1,82 @@
 import requests
 import os
+import json
+import hashlib
+import argparse
 import zipfile
-import glob
 import xml.etree.ElementTree as ET
 import sqlite3
 import re
 from datetime import datetime
-from core.utilities.database import create_table_schema, connect_to_database
 import tempfile
 import subprocess
 import sys
 import time
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+
+# Allow running as "python3 core/update_database.py" from the RetroSpin directory
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.utilities.database import create_table_schema, create_indexes, drop_indexes, connect_to_database
+from core.utilities.catalog import normalize_serial, get_index_path, write_serial_index, index_version, INDEX_VERSION
+from core.utilities.regions import extract_region_and_language
+from core.utilities.titles import title_keys
 
 # URL template for Redump DAT files
 REDUMP_URL_TEMPLATE = "http://redump.org/datfile/{}/serial,version"
 DATA_DIR = "data"
 DAT_DIR = os.path.join(DATA_DIR, "dat")
 DB_PATH = os.path.join(DATA_DIR, "games.db")
+MANIFEST_PATH = os.path.join(DAT_DIR, "manifest.json")
 
 # List of systems to scrape
 SYSTEMS = ["psx", "ajcd", "acd", "cd32", "cdtv", "pce", "ngcd", "3do", "cdi", "mcd", "ss"]
 SYSTEM_NAMES = ["Sony Playstation", "Atari Jaguar CD", "Amiga CD", "Amiga CD32", "Amiga CDTV", "NEC PC Engine", "Neo Geo CD", "Panasonic 3DO", "Philips CDI", "Sega CD", "Sega Saturn"]
 
-# Region mappings
-REGION_MAP = {
-    "USA": "NTSC-U",
-    "Europe": "PAL",
-    "Japan": "NTSC-J",
-    "Asia": "NTSC-J",
-    "Australia": "PAL",
-    "Brazil": "NTSC-U",
-    "Canada": "NTSC-U",
-    "China": "NTSC-J",
-    "France": "PAL",
-    "Germany": "PAL",
-    "Italy": "PAL",
-    "Korea": "NTSC-J",
-    "Netherlands": "PAL",
-    "Spain": "PAL",
-    "Sweden": "PAL",
-    "Taiwan": "NTSC-J",
-    "UK": "PAL",
-    "Russia": "PAL",
-    "Scandinavia": "PAL",
-    "Greece": "PAL",
-    "Finland": "PAL",
-    "Norway": "PAL",
-    "Ireland": "PAL",
-    "Portugal": "PAL",
-    "Austria": "PAL",
-    "Israel": "PAL",
-    "Poland": "PAL",
-    "Denmark": "PAL",
-    "Belgium": "PAL",
-    "India": "PAL",
-    "Latin America": "PAL",
-    "Croatia": "PAL",
-    "World": "NTSC-U",
-    "Switzerland": "PAL",
-    "South Africa": "PAL"
+# Redump DAT name prefixes, used to recognise DATs in a local source directory
+REDUMP_DAT_NAMES = {
+    "psx": "Sony - PlayStation",
+    "ajcd": "Atari - Jaguar CD Interactive Multimedia System",
+    "acd": "Commodore - Amiga CD",
+    "cd32": "Commodore - Amiga CD32",
+    "cdtv": "Commodore - Amiga CDTV",
+    "pce": "NEC - PC Engine CD & TurboGrafx CD",
+    "ngcd": "SNK - Neo Geo CD",
+    "3do": "Panasonic - 3DO Interactive Multiplayer",
+    "cdi": "Philips - CD-i",
+    "mcd": "Sega - Mega CD & Sega CD",
+    "ss": "Sega - Saturn"
 }
 
-# Language mappings for explicit tags
-LANGUAGE_MAP = {
-    "En": "English",
-    "Ja": "Japanese",
-    "Fr": "French",
-    "De": "German",
-    "Es": "Spanish",
-    "It": "Italian",
-    "Nl": "Dutch",
-    "Pt": "Portuguese",
-    "Sv": "Swedish",
-    "No": "Norwegian",
-    "Da": "Danish",
-    "Fi": "Finnish",
-    "Zh": "Chinese",
-    "Ko": "Korean",
-    "Pl": "Polish",
-    "Ru": "Russian",
-    "El": "Greek",
-    "He": "Hebrew"
-}
+# Concurrent DAT downloads sharing one keep-alive session
+DOWNLOAD_WORKERS = 3
+DOWNLOAD_RETRIES = 3
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
 
-# Region-to-language mapping for all regions
-REGION_LANGUAGE_MAP = {
-    "USA": "English",
-    "Europe": "English",
-    "Japan": "Japanese",
-    "Asia": "English",
-    "Australia": "English",
-    "Brazil": "Portuguese",
-    "Canada": "English",
-    "China": "Chinese",
-    "France": "French",
-    "Germany": "German",
-    "Italy": "Italian",
-    "Korea": "Korean",
-    "Netherlands": "Dutch",
-    "Spain": "Spanish",
-    "Sweden": "Swedish",
-    "Taiwan": "Chinese",
-    "UK": "English",
-    "Russia": "Russian",
-    "Scandinavia": "English",
-    "Greece": "Greek",
-    "Finland": "Finnish",
-    "Norway": "Norwegian",
-    "Ireland": "English",
-    "Portugal": "Portuguese",
-    "Austria": "German",
-    "Israel": "Hebrew",
-    "Poland": "Polish",
-    "Denmark": "Danish",
-    "Belgium": "Dutch",
-    "India": "English",
-    "Latin America": "Spanish",
-    "Croatia": "Croatian",
-    "World": "English",
-    "Switzerland": "German",
-    "South Africa": "English"
-}
+# Keep downloaded DAT zips (compressed) in the dat directory; when off they are only held in memory
+KEEP_DAT_ARCHIVES = True
+SPOOL_MAX_SIZE = 32 * 1024 * 1024
+
+# Serializes gauge writes from the download workers
+GAUGE_LOCK = threading.Lock()
+
+# Rows handed to executemany at a time while loading a system
+INSERT_BATCH_SIZE = 1000
+
+# Row batches buffered between the parse and writer stages
+PIPELINE_QUEUE_SIZE = 4
+
+GAMES_INSERT_SQL = '''
+    INSERT OR REPLACE INTO games (serial, title, category, region, system, language, normalized_serial,
+                                  sanitized_title, cleaned_title, title_key)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+UNKNOWN_INSERT_SQL = '''
+    INSERT OR REPLACE INTO unknown (serial, title, category, region, system, language, timestamp)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+'''
 
 # Browser-like headers for requests
 REQUEST_HEADERS = {
@@ -140,59 +96,103 @@ def ensure_data_dir():
     if not os.path.exists(DAT_DIR):
         os.makedirs(DAT_DIR)
 
-def extract_region_and_language(game_name):
-    """Extract region and language from game name."""
-    region = "Unknown"
-    language = "Unknown"
-    
-    # Check for regions in parentheses (e.g., "Japan", "USA", "Japan, Asia")
-    region_match = re.findall(r'\(([^)]+)\)', game_name)
-    matched_regions = []
-    if region_match:
-        for regions in region_match:
-            # Split multiple regions (e.g., "Japan, Asia" → ["Japan", "Asia"])
-            region_list = [r.strip() for r in regions.split(",")]
-            for r in region_list:
-                # Check if the region (or part of it) is in REGION_MAP
-                for map_region, db_region in REGION_MAP.items():
-                    if map_region.lower() in r.lower():
-                        region = db_region
-                        matched_regions.append(map_region)
-                        break
-                if region != "Unknown":
-                    break
-            if region != "Unknown":
-                break
-    
-    # Check for language map
-    lang_match = re.search(r'\((En?,(?:[A-Z][a-z]?,)*[A-Z][a-z]?)\)', game_name)
-    if lang_match:
-        redump_langs = lang_match.group(1).split(",")
-        db_langs = [LANGUAGE_MAP.get(lang.strip(), lang.strip()) for lang in redump_langs]
-        language = ", ".join(db_langs)
-    else:
-        # Region-based language mapping
-        for matched_region in matched_regions:
-            if matched_region in REGION_LANGUAGE_MAP:
-                language = REGION_LANGUAGE_MAP[matched_region]
-                break
-    
-    return region, language
+def create_session():
+    """Create a keep-alive HTTP session sized for the download worker pool."""
+    session = requests.Session()
+    session.headers.update(REQUEST_HEADERS)
+    adapter = HTTPAdapter(pool_connections=DOWNLOAD_WORKERS, pool_maxsize=DOWNLOAD_WORKERS)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def load_manifest():
+    """Load the per-system DAT manifest (ETag, Last-Modified, content hash, DAT path)."""
+    try:
+        with open(MANIFEST_PATH, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_manifest(manifest):
+    """Write the DAT manifest, replacing the old file only once the new one is complete."""
+    temp_path = MANIFEST_PATH + ".tmp"
+    with open(temp_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(temp_path, MANIFEST_PATH)
+
+def find_dat_member(zip_ref):
+    """Return the name of the .dat member inside a Redump zip."""
+    dat_members = [name for name in zip_ref.namelist() if name.lower().endswith(".dat")]
+    if not dat_members:
+        raise ValueError("No .dat file found in the zip")
+    return dat_members[0]
+
+def open_dat(dat_source):
+    """Open a DAT for streaming, reading the .dat member in place when the source is a zip (path or file object)."""
+    if zipfile.is_zipfile(dat_source):
+        if hasattr(dat_source, "seek"):
+            dat_source.seek(0)
+        # The member stream keeps the archive open after the ZipFile itself is closed
+        with zipfile.ZipFile(dat_source, "r") as zip_ref:
+            return zip_ref.open(find_dat_member(zip_ref))
+    if hasattr(dat_source, "read"):
+        # Downloads kept in memory are always Redump zips
+        raise zipfile.BadZipFile("Downloaded DAT is not a zip file")
+    return open(dat_source, "rb")
 
-def download_and_extract_dat(i, system, system_name, gauge_process, base_percent, system_share):
-    """Download Redump DAT zip for a system, extract .dat, and return its path."""
-    url = REDUMP_URL_TEMPLATE.format(system)
-    zip_path = None
-    for attempt in range(2):
+def record_manifest_entry(manifest, system, entry):
+    """Store a system's new manifest entry and remove the DAT archive it supersedes."""
+    cached = manifest.get(system)
+    old_dat = cached.get("dat") if cached else None
+    if old_dat and old_dat != entry["dat"] and os.path.dirname(old_dat) == DAT_DIR and os.path.exists(old_dat):
+        os.remove(old_dat)
+    manifest[system] = entry
+    save_manifest(manifest)
+
+def hash_dat(dat_source):
+    """Return the SHA-256 hex digest of the uncompressed DAT content, streamed without extracting it."""
+    digest = hashlib.sha256()
+    with open_dat(dat_source) as f:
+        for chunk in iter(lambda: f.read(DOWNLOAD_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def download_dat(system, system_name, gauge_process, base_percent, system_share, session=None, url_template=REDUMP_URL_TEMPLATE, cached=None):
+    """Download a system's Redump DAT zip and return (DAT source, manifest entry).
+
+    The zip is written once, compressed, into the dat directory (or kept in memory when
+    KEEP_DAT_ARCHIVES is off) and parsed straight from its .dat member. When the cached manifest
+    entry still points at a DAT on disk the request is conditional, and a 304 Not Modified
+    response returns the cached entry as-is.
+    """
+    url = url_template.format(system)
+    session = session or create_session()
+    headers = {}
+    if cached and cached.get("dat") and os.path.exists(cached["dat"]):
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+    for attempt in range(DOWNLOAD_RETRIES):
+        dat_file = None
+        zip_path = None
         try:
             if attempt == 0:
                 update_gauge(gauge_process, f"Fetching DAT file for {system_name}...")
             else:
                 update_gauge(gauge_process, f"Retrying fetch for {system_name}...")
-            response = requests.get(url, stream=True, timeout=10, headers=REQUEST_HEADERS)
+            response = session.get(url, stream=True, timeout=10, headers=headers)
+            if response.status_code == 304:
+                response.close()
+                update_gauge(gauge_process, f"DAT file for {system_name} not modified", int(base_percent + (system_share * 0.6)))
+                return cached["dat"], cached
             response.raise_for_status()
             
-            total_size = int(response.headers.get('content-length', 0))
+            try:
+                total_size = int(response.headers.get('content-length', 0))
+            except ValueError:
+                # Only used for progress; a malformed header must not fail the download
+                total_size = 0
             
             # Extract filename or use default
             filename = None
@@ -200,128 +200,150 @@ def download_and_extract_dat(i, system, system_name, gauge_process, base_percent
                 disposition = response.headers['Content-Disposition']
                 match = re.search(r'filename="(.+)"', disposition)
                 if match:
-                    filename = match.group(1)
+                    filename = os.path.basename(match.group(1))
             if not filename:
                 filename = f"{system}_redump_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.zip"
             
-            zip_path = os.path.join(DATA_DIR, filename)
+            if KEEP_DAT_ARCHIVES:
+                zip_path = os.path.join(DAT_DIR, filename)
+                dat_file = open(zip_path + ".part", "wb")
+            else:
+                zip_path = None
+                dat_file = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
             
-            downloaded = 0
-            with open(zip_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=4096):
+            # Closed on every path; a partial download on disk is removed unless it was completed
+            completed = False
+            try:
+                downloaded = 0
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
                     if chunk:
-                        f.write(chunk)
+                        dat_file.write(chunk)
                         downloaded += len(chunk)
                         if total_size > 0:
                             sub_percent = (downloaded / total_size) * 100
                             overall_percent = int(base_percent + (sub_percent / 100) * (system_share / 2))  # Download is half of system share
                             update_gauge(gauge_process, f"Downloading DAT file for {system_name}: {int(sub_percent)}%", overall_percent)
             
-            if total_size > 0:
-                update_gauge(gauge_process, f"Downloaded DAT file for {system_name}", int(base_percent + (system_share / 2)))
-            else:
-                update_gauge(gauge_process, f"Saved zip file for {system_name}", int(base_percent + (system_share / 2)))
+                if zip_path:
+                    dat_file.close()
+                    os.replace(zip_path + ".part", zip_path)
+                    dat_source = zip_path
+                else:
+                    dat_source = dat_file
             
-            # If successful, break the retry loop
-            break
+                update_gauge(gauge_process, f"Downloaded DAT file for {system_name}", int(base_percent + (system_share / 2)))
+                entry = {
+                    "dat": zip_path,
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                    "sha256": hash_dat(dat_source)
+                }
+                completed = True
+            finally:
+                if zip_path:
+                    dat_file.close()
+                    if os.path.exists(zip_path + ".part"):
+                        os.remove(zip_path + ".part")
+                elif not completed:
+                    dat_file.close()
+            return dat_source, entry
         
         except requests.RequestException as e:
             update_gauge(gauge_process, f"Error downloading for {system_name}: {e}")
-            if attempt == 0:
-                update_gauge(gauge_process, "Retrying in 1 second...")
-                time.sleep(1)
-            else:
-                return None
-    
-    if zip_path is None:
-        return None
-    
-    # Now attempt extraction
+            if attempt < DOWNLOAD_RETRIES - 1:
+                # Back off in this worker only; other systems keep downloading
+                delay = 2 ** attempt
+                update_gauge(gauge_process, f"Retrying {system_name} in {delay} second(s)...")
+                time.sleep(delay)
+        except (zipfile.BadZipFile, ValueError) as e:
+            update_gauge(gauge_process, f"Error: Invalid zip for {system_name}: {e}")
+            if zip_path and os.path.exists(zip_path):
+                os.remove(zip_path)
+            return None, None
+    return None, None
+
+def close_dat_source(dat_source):
+    """Release an in-memory DAT download; DATs kept on disk are referenced by path and need no cleanup."""
+    if hasattr(dat_source, "close"):
+        dat_source.close()
+
+def find_local_dat(source_dir, system):
+    """Find the DAT (.dat or .zip) for a system in a local directory, by system code or Redump DAT name."""
+    candidates = []
+    for filename in sorted(os.listdir(source_dir)):
+        name, ext = os.path.splitext(filename)
+        if ext.lower() not in (".dat", ".zip"):
+            continue
+        if name.lower() == system or name.startswith(REDUMP_DAT_NAMES[system] + " - "):
+            candidates.append(os.path.join(source_dir, filename))
+    # Redump names end in a version date, so the last one sorted is the newest
+    return candidates[-1] if candidates else None
+
+def load_local_dat(system, system_name, gauge_process, base_percent, system_share, source_dir):
+    """Resolve a system's DAT (zipped or plain) from a local directory and return (DAT source, manifest entry)."""
     try:
-        update_gauge(gauge_process, f"Extracting zip for {system_name}...", int(base_percent + (system_share / 2)))
-        with tempfile.TemporaryDirectory() as temp_dir:
-            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-                zip_ref.extractall(temp_dir)
-            
-            dat_files = glob.glob(os.path.join(temp_dir, "*.dat"))
-            if not dat_files:
-                raise ValueError(f"No .dat file found in the zip for {system_name}")
-            if len(dat_files) > 1:
-                update_gauge(gauge_process, f"Warning: Multiple .dat files for {system_name}, using first")
-            dat_path = dat_files[0]
-            
-            # Move .dat to dat directory
-            dat_filename = os.path.basename(dat_path)
-            final_dat_path = os.path.join(DAT_DIR, dat_filename)
-            with open(dat_path, 'rb') as src, open(final_dat_path, 'wb') as dst:
-                dst.write(src.read())
-        update_gauge(gauge_process, f"Saved DAT file for {system_name}", int(base_percent + (system_share * 0.6)))
-        
-        # Delete the zip file
-        os.remove(zip_path)
-        update_gauge(gauge_process, f"Deleted zip file for {system_name}", int(base_percent + (system_share * 0.6)))
-        
-        return final_dat_path
-    
-    except zipfile.BadZipFile as e:
-        update_gauge(gauge_process, f"Error: Invalid zip for {system_name}")
-        if os.path.exists(zip_path):
-            os.remove(zip_path)
-        return None
-    except Exception as e:
-        update_gauge(gauge_process, f"Error processing for {system_name}: {e}")
-        if os.path.exists(zip_path):
-            os.remove(zip_path)
-        return None
-
-def parse_redump_xml(file_path, system, system_name, gauge_process, base_percent, system_share):
-    """Parse Redump DAT (XML) and return list of game data."""
-    games = []
-    unknown_games = []
+        dat_path = find_local_dat(source_dir, system)
+    except OSError as e:
+        update_gauge(gauge_process, f"Error reading DAT directory {source_dir} for {system_name}: {e}")
+        return None, None
+    if not dat_path:
+        update_gauge(gauge_process, f"No local DAT file for {system_name} in {source_dir}")
+        return None, None
+    try:
+        return dat_path, {"dat": dat_path, "etag": None, "last_modified": None, "sha256": hash_dat(dat_path)}
+    except (OSError, zipfile.BadZipFile, ValueError) as e:
+        update_gauge(gauge_process, f"Error reading local DAT for {system_name}: {e}")
+        return None, None
+
+def parse_redump_xml(dat_source, system, system_name, gauge_process, base_percent, system_share):
+    """Stream a Redump DAT (XML, plain or zipped) and yield ("games" | "unknown", row tuple) pairs in insert column order."""
+    games = 0
+    unknown_games = 0
+    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    dat_file = None
     try:
         update_gauge(gauge_process, f"Parsing XML for {system_name}...", int(base_percent + (system_share * 0.6)))
-        tree = ET.parse(file_path)
-        root = tree.getroot()
-        
-        for game in root.findall("game"):
-            title = game.get("name")
-            category_elem = game.find("category")
-            serial_elem = game.find("serial")
+        root = None
+        # Clear each <game> once handled so memory stays flat regardless of DAT size
+        dat_file = open_dat(dat_source)
+        for event, elem in ET.iterparse(dat_file, events=("start", "end")):
+            if root is None:
+                root = elem
+                continue
+            if event != "end" or elem.tag != "game":
+                continue
+            
+            title = elem.get("name")
+            category_elem = elem.find("category")
+            serial_elem = elem.find("serial")
             
-            category = category_elem.text.strip() if category_elem is not None else "Unknown"
-            serial = serial_elem.text.strip() if serial_elem is not None else None
+            category = category_elem.text.strip() if category_elem is not None and category_elem.text else "Unknown"
+            serial = serial_elem.text.strip() if serial_elem is not None and serial_elem.text else None
             region, language = extract_region_and_language(title)
             
             if not serial or serial == "":
                 # Add to unknown_games if no serial
-                unknown_games.append({
-                    "title": title,
-                    "category": category,
-                    "serial": "Unknown",
-                    "region": region,
-                    "system": system.upper(),
-                    "language": language,
-                    "timestamp": datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                })
+                unknown_games += 1
+                yield "unknown", ("Unknown", title, category, region, system.upper(), language, timestamp)
             else:
                 # Split multiple serials and create a row for each
                 serials = [s.strip() for s in serial.split(",") if s.strip()]
+                # Match keys for local file lookup, computed once here instead of on every launch
+                keys = title_keys(title)
                 for serial in serials:
-                    games.append({
-                        "title": title,
-                        "category": category,
-                        "serial": serial,
-                        "region": region,
-                        "system": system.upper(),
-                        "language": language
-                    })
+                    games += 1
+                    yield "games", (serial, title, category, region, system.upper(), language, normalize_serial(serial)) + keys
+            root.clear()
         
-        update_gauge(gauge_process, f"Parsed {len(games)} games and {len(unknown_games)} unknown for {system_name}", int(base_percent + (system_share * 0.8)))
-        return games, unknown_games
+        update_gauge(gauge_process, f"Parsed {games} games and {unknown_games} unknown for {system_name}", int(base_percent + (system_share * 0.8)))
     
     except Exception as e:
         update_gauge(gauge_process, f"Error parsing XML for {system_name}: {e}")
-        return [], []
+        # Partial rows must not be applied as a diff, or everything after the error would be deleted
+        raise
+    finally:
+        if dat_file is not None:
+            dat_file.close()
 
 def update_gauge(gauge_process, message, percent=None):
     """Update the dialog gauge with new message and optional percent."""
@@ -329,80 +351,271 @@ def update_gauge(gauge_process, message, percent=None):
         input_str = f"XXX\n{percent}\n{message}\nXXX\n"
     else:
         input_str = f"XXX\n{message}\nXXX\n"
-    gauge_process.stdin.write(input_str.encode())
-    gauge_process.stdin.flush()
+    with GAUGE_LOCK:
+        gauge_process.stdin.write(input_str.encode())
+        gauge_process.stdin.flush()
 
-def populate_database(gauge_process):
-    """Scrape Redump DAT files for all systems and populate games and unknown tables."""
-    ensure_data_dir()
+def tune_for_bulk_load(cursor):
+    """Trade durability for write speed while the database is rebuilt (it can always be re-downloaded)."""
+    cursor.execute("PRAGMA journal_mode = MEMORY")
+    cursor.execute("PRAGMA synchronous = OFF")
+    cursor.execute("PRAGMA cache_size = -16384")  # 16 MB
+    cursor.execute("PRAGMA temp_store = MEMORY")
+
+def restore_durable_pragmas(cursor):
+    """Return the database to the default rollback journal once the bulk load is done."""
+    cursor.execute("PRAGMA journal_mode = DELETE")
+    cursor.execute("PRAGMA synchronous = FULL")
+
+def bulk_insert_rows(cursor, rows):
+    """Insert ("games" | "unknown", row tuple) pairs with executemany in batches of INSERT_BATCH_SIZE."""
+    batches = {"games": [], "unknown": []}
+    statements = {"games": GAMES_INSERT_SQL, "unknown": UNKNOWN_INSERT_SQL}
+    for table, row in rows:
+        batch = batches[table]
+        batch.append(row)
+        if len(batch) >= INSERT_BATCH_SIZE:
+            cursor.executemany(statements[table], batch)
+            batch.clear()
+    for table, batch in batches.items():
+        if batch:
+            cursor.executemany(statements[table], batch)
+
+def fetch_all_dats(executor, session, gauge_process, system_share, manifest, url_template=REDUMP_URL_TEMPLATE, source_dir=None):
+    """Submit a DAT fetch for every system to the worker pool and return the futures in SYSTEMS order."""
+    futures = []
+    for i, (system, system_name) in enumerate(zip(SYSTEMS, SYSTEM_NAMES)):
+        if source_dir:
+            futures.append(executor.submit(load_local_dat, system, system_name, gauge_process,
+                                           i * system_share, system_share, source_dir))
+        else:
+            futures.append(executor.submit(download_dat, system, system_name, gauge_process,
+                                           i * system_share, system_share, session, url_template, manifest.get(system)))
+    return futures
+
+def load_populated_systems():
+    """Ensure the schema exists and return the set of systems that already have rows in the database."""
     conn, cursor = connect_to_database()
     create_table_schema(cursor)
-    
-    num_systems = len(SYSTEMS)
-    system_share = 100 / num_systems
-    
-    failed_systems = []
-    
-    for i in range(num_systems):
-        system = SYSTEMS[i]
-        system_name = SYSTEM_NAMES[i]
-        base_percent = i * system_share
-        
-        dat_path = download_and_extract_dat(i, system, system_name, gauge_process, base_percent, system_share)
-        if not dat_path:
-            failed_systems.append(system_name)
-            update_gauge(gauge_process, f"Failed to process {system_name}", int(base_percent + system_share))
+    conn.commit()
+    cursor.execute("SELECT DISTINCT system FROM games UNION SELECT DISTINCT system FROM unknown")
+    populated = {row[0] for row in cursor.fetchall()}
+    conn.close()
+    return populated
+
+def apply_system_diff(cursor, system, rows):
+    """Write only the rows that were added or changed since the last update, then delete rows no longer in the DAT."""
+    cursor.execute("SELECT serial, title, category, region, system, language, normalized_serial, sanitized_title, cleaned_title, title_key FROM games WHERE system = ?", (system.upper(),))
+    existing_games = {row[0]: row for row in cursor.fetchall()}
+    cursor.execute("SELECT serial, title, category, region, system, language FROM unknown WHERE system = ?", (system.upper(),))
+    existing_unknown = {row[1]: row for row in cursor.fetchall()}
+    counts = {"added": 0, "changed": 0, "removed": 0}
+
+    # Keys already compared; a DAT can repeat a key and INSERT OR REPLACE must still end on its last row
+    seen = set()
+
+    def changed_rows():
+        for table, row in rows:
+            if table == "games":
+                key, compare, existing = row[0], row, existing_games
+            else:
+                # The unknown table is keyed on title, and its timestamp is not part of the comparison
+                key, compare, existing = row[1], row[:6], existing_unknown
+            if (table, key) in seen:
+                yield table, row
+                continue
+            seen.add((table, key))
+            old = existing.pop(key, None)
+            if old is None:
+                counts["added"] += 1
+            elif tuple(old) != tuple(compare):
+                counts["changed"] += 1
+            else:
+                continue
+            yield table, row
+
+    bulk_insert_rows(cursor, changed_rows())
+    if existing_games:
+        cursor.executemany("DELETE FROM games WHERE serial = ? AND system = ?", [(serial, system.upper()) for serial in existing_games])
+    if existing_unknown:
+        cursor.executemany("DELETE FROM unknown WHERE title = ? AND system = ?", [(title, system.upper()) for title in existing_unknown])
+    counts["removed"] = len(existing_games) + len(existing_unknown)
+    return counts
+
+def parse_stage(downloads, manifest, populated_systems, row_queue, gauge_process, system_share):
+    """Parse each system's DAT as soon as its download completes and queue row batches for the writer."""
+    try:
+        for i, (system, system_name) in enumerate(zip(SYSTEMS, SYSTEM_NAMES)):
+            base_percent = i * system_share
+            try:
+                dat_source, entry = downloads[i].result()
+            except Exception as e:
+                # A fetch that raised is reported like any other failed download; later systems still load
+                update_gauge(gauge_process, f"Error fetching DAT for {system_name}: {e}")
+                dat_source = None
+            if not dat_source:
+                row_queue.put(("failed", i, None))
+                continue
+            
+            cached = manifest.get(system)
+            if cached and cached.get("sha256") == entry["sha256"] and system.upper() in populated_systems:
+                close_dat_source(dat_source)
+                row_queue.put(("unchanged", i, entry))
+                continue
+            
+            row_queue.put(("system", i, entry))
+            batch = []
+            try:
+                for row in parse_redump_xml(dat_source, system, system_name, gauge_process, base_percent, system_share):
+                    batch.append(row)
+                    if len(batch) >= INSERT_BATCH_SIZE:
+                        row_queue.put(("rows", i, batch))
+                        batch = []
+                if batch:
+                    row_queue.put(("rows", i, batch))
+                row_queue.put(("end", i, None))
+            except Exception as e:
+                row_queue.put(("abort", i, str(e)))
+            finally:
+                close_dat_source(dat_source)
+    finally:
+        # The writer blocks on the queue until it sees this, so it must be sent even if parsing dies
+        row_queue.put(None)
+
+def queued_rows(row_queue, stream):
+    """Yield a system's rows from the queue until its end marker; an abort marker raises so the writer rolls back."""
+    while True:
+        kind, i, payload = row_queue.get()
+        if kind == "rows":
+            yield from payload
             continue
+        stream["finished"] = True
+        if kind == "abort":
+            raise ValueError(payload)
+        return
+
+def writer_stage(row_queue, manifest, gauge_process, system_share, result):
+    """Own the SQLite connection and apply each system's queued rows, committing one system at a time.
+
+    Any error outside a single system's rows is stored in result["error"] for populate_database to report.
+    """
+    conn = None
+    try:
+        conn, cursor = connect_to_database()
+        tune_for_bulk_load(cursor)
+        changed_systems = 0
+    
+        while True:
+            message = row_queue.get()
+            if message is None:
+                break
+            kind, i, entry = message
+            system = SYSTEMS[i]
+            system_name = SYSTEM_NAMES[i]
+            base_percent = i * system_share
         
-        games, unknown_games = parse_redump_xml(dat_path, system, system_name, gauge_process, base_percent, system_share)
+            if kind == "failed":
+                result["failed_systems"].append(system_name)
+                update_gauge(gauge_process, f"Failed to process {system_name}", int(base_percent + system_share))
+                continue
+            if kind == "unchanged":
+                if entry != manifest.get(system):
+                    # Same content under new validators or a new file name
+                    record_manifest_entry(manifest, system, entry)
+                update_gauge(gauge_process, f"No changes for {system_name}", int(base_percent + system_share))
+                continue
         
-        update_gauge(gauge_process, f"Inserting data for {system_name} into database...", int(base_percent + (system_share * 0.8)))
-        # Insert into games table
-        for game in games:
-            cursor.execute('''
-                INSERT OR REPLACE INTO games (serial, title, category, region, system, language)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (
-                game["serial"],
-                game["title"],
-                game["category"],
-                game["region"],
-                game["system"],
-                game["language"]
-            ))
+            if changed_systems == 0:
+                # Rows are about to change; maintain the lookup index once at the end instead of per row
+                drop_indexes(cursor)
+            changed_systems += 1
         
-        # Insert into unknown table
-        for game in unknown_games:
-            cursor.execute('''
-                INSERT OR REPLACE INTO unknown (serial, title, category, region, system, language, timestamp)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                game["serial"],
-                game["title"],
-                game["category"],
-                game["region"],
-                game["system"],
-                game["language"],
-                game["timestamp"]
-            ))
+            update_gauge(gauge_process, f"Parsing and updating data for {system_name} in database...", int(base_percent + (system_share * 0.6)))
+            stream = {"finished": False}
+            try:
+                counts = apply_system_diff(cursor, system, queued_rows(row_queue, stream))
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                # Skip whatever the parser still queues for this system
+                if not stream["finished"]:
+                    for _ in queued_rows(row_queue, stream):
+                        pass
+                result["failed_systems"].append(system_name)
+                update_gauge(gauge_process, f"Error inserting data for {system_name}: {e}", int(base_percent + system_share))
+                continue
         
+            # Only record the new DAT once its rows are committed, so a failed system is retried next run
+            record_manifest_entry(manifest, system, entry)
+            update_gauge(gauge_process, f"Updated {system_name}: {counts['added']} added, {counts['changed']} changed, {counts['removed']} removed", int(base_percent + system_share))
+    
+        # Build indexes once over the loaded rows rather than maintaining them per insert
+        create_indexes(cursor)
         conn.commit()
-        update_gauge(gauge_process, f"Inserted data for {system_name}", int(base_percent + system_share))
+        restore_durable_pragmas(cursor)
+    
+        # Get counts for final message
+        cursor.execute("SELECT COUNT(*) FROM games")
+        result["game_count"] = cursor.fetchone()[0]
+        cursor.execute("SELECT COUNT(*) FROM unknown")
+        result["unknown_count"] = cursor.fetchone()[0]
+    
+        # Precompile the serial index the service memory-maps at startup
+        index_path = get_index_path(DB_PATH)
+        if changed_systems or index_version(index_path) != INDEX_VERSION:
+            try:
+                indexed = write_serial_index(cursor, index_path)
+                print(f"Wrote {indexed} serials to {index_path}")
+            except (OSError, sqlite3.Error) as e:
+                print(f"Error writing serial index {index_path}: {e}")
+    except Exception as e:
+        # The parser is a daemon, so stopping here cannot hang the update; closing discards uncommitted rows
+        result["error"] = str(e)
+    finally:
+        if conn is not None:
+            conn.close()
+
+def populate_database(gauge_process, url_template=REDUMP_URL_TEMPLATE, source_dir=None):
+    """Scrape Redump DAT files for all systems and apply only changed rows to the games and unknown tables.
+
+    Runs as a pipeline: the download pool fetches ahead, a parse thread turns each DAT into row
+    batches, and a single writer thread owns the database connection, so the network, CPU and
+    SD card work on different systems at the same time. source_dir points at a local directory
+    of DATs to use instead of redump.org.
+    """
+    ensure_data_dir()
+    manifest = load_manifest()
+    populated_systems = load_populated_systems()
+    
+    num_systems = len(SYSTEMS)
+    system_share = 100 / num_systems
+    result = {"failed_systems": [], "game_count": 0, "unknown_count": 0, "error": None}
+    
+    session = create_session()
+    executor = ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS)
+    downloads = fetch_all_dats(executor, session, gauge_process, system_share, manifest, url_template, source_dir)
+    
+    row_queue = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    parser = threading.Thread(target=parse_stage, args=(downloads, manifest, populated_systems, row_queue, gauge_process, system_share), daemon=True)
+    writer = threading.Thread(target=writer_stage, args=(row_queue, manifest, gauge_process, system_share, result))
+    parser.start()
+    writer.start()
+    # The writer only finishes after the parser's final marker; the parser is a daemon so a failed writer can't hang the update
+    writer.join()
+    
+    executor.shutdown()
+    session.close()
     
     # Close the gauge
     gauge_process.stdin.close()
     gauge_process.wait()
     
-    # Get counts for final message
-    cursor.execute("SELECT COUNT(*) FROM games")
-    game_count = cursor.fetchone()[0]
-    cursor.execute("SELECT COUNT(*) FROM unknown")
-    unknown_count = cursor.fetchone()[0]
-    
-    conn.close()
-    
     # Show completion message
-    message = f"Database update complete.\nTotal games: {game_count}\nTotal unknown entries: {unknown_count}"
+    failed_systems = result["failed_systems"]
+    if result["error"]:
+        message = f"Database update failed: {result['error']}"
+    else:
+        message = f"Database update complete.\nTotal games: {result['game_count']}\nTotal unknown entries: {result['unknown_count']}"
     if failed_systems:
         message += f"\nFailed to update: {', '.join(failed_systems)}"
     cmd = ['dialog', '--backtitle', 'RetroSpin Disc Manager', '--msgbox', message, '10', '50']
@@ -411,4 +624,17 @@ def populate_database(gauge_process):
         subprocess.run(cmd_str, shell=True, check=True)
     except subprocess.CalledProcessError as e:
         with open("/tmp/retrospin_err.log", "a") as f:
-            f.write(f"{time.strftime('%Y-%m-%d %H:%M:%S')} - update_database.py: Failed to display msgbox: {e}\n")
\ No newline at end of file
+            f.write(f"{time.strftime('%Y-%m-%d %H:%M:%S')} - update_database.py: Failed to display msgbox: {e}\n")
+
+def main():
+    """Run the database update behind a dialog gauge."""
+    parser = argparse.ArgumentParser(description="Update games.db from Redump DAT files.")
+    parser.add_argument("--source", help="Directory of local Redump DATs (.dat or .zip) to use instead of downloading")
+    args = parser.parse_args()
+    cmd = ['dialog', '--backtitle', 'RetroSpin Disc Manager', '--gauge', 'Updating database...', '10', '50', '0']
+    cmd_str = ' '.join([f'"{arg}"' if ' ' in arg else arg for arg in cmd]) + ' >/dev/tty'
+    gauge_process = subprocess.Popen(cmd_str, shell=True, stdin=subprocess.PIPE)
+    populate_database(gauge_process, source_dir=args.source)
+
+if __name__ == "__main__":
+    main()
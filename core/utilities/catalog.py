@@ -0,0 +1,327 @@
+import os
+import mmap
+import struct
+import sqlite3
+import threading
+from bisect import bisect_left
+from core.utilities.titles import title_keys
+from core.utilities.database import get_db_path, load_game_titles, load_title_keys
+
+# Catalog backend used by open_catalog(): "mmap" binary-searches games.idx, "sqlite" queries games.db on demand,
+# "memory" loads every row up front, "auto" picks mmap when an up-to-date games.idx exists and sqlite otherwise
+CATALOG_MODE = os.environ.get("RETROSPIN_CATALOG", "auto")
+
+# games.idx layout (little endian):
+#   header:  magic, version, key width, system count
+#   systems: system code, record count, offset of first record   (one entry per system)
+#   records: NUL-padded normalized serial, title offset           (sorted by serial within each system)
+#   titles:  title, sanitized title, cleaned title and title key, each u16 length + UTF-8 bytes,
+#            referenced by title offset
+INDEX_MAGIC = b"RSIX"
+INDEX_VERSION = 2
+INDEX_HEADER = struct.Struct("<4sHHI")
+INDEX_SYSTEM = struct.Struct("<8sII")
+INDEX_TITLE_LENGTH = struct.Struct("<H")
+
+# Sorts after every character a serial can contain, so [key, key + PREFIX_END) covers all serials starting with key
+PREFIX_END = "\U0010ffff"
+
+# Mapping from launcher system names to the system codes stored in games.db
+DB_SYSTEM_CODES = {
+    "psx": "psx",
+    "saturn": "ss",
+    "megacd": "mcd",
+    "neogeo": "ngcd",
+    "cdi": "cdi",
+    "tgcd": "pce",
+    "3do": "3do",
+    "jaguar": "ajcd"
+}
+
+def normalize_serial(serial):
+    """Normalize a serial the same way for the database and the disc readers (strip, drop underscores, uppercase)."""
+    return serial.strip().replace("_", "").upper()
+
+class SerialIndex:
+    """In-memory per-system serial index backed by sorted arrays for exact and prefix lookups."""
+
+    def __init__(self):
+        self.keys = {}    # system -> sorted list of normalized serials
+        self.titles = {}  # system -> list of [(serial, title), ...] parallel to keys
+        self.stored_title_keys = {}  # (system, title) -> (sanitized title, cleaned title, title key)
+
+    @classmethod
+    def from_game_titles(cls, game_titles, stored_title_keys=None):
+        """Build an index from the {(serial, system): [(serial, title), ...]} dict returned by load_game_titles."""
+        index = cls()
+        index.stored_title_keys = stored_title_keys or {}
+        grouped = {}
+        for (serial, system), titles in game_titles.items():
+            grouped.setdefault(system, []).append((serial, titles))
+        for system, entries in grouped.items():
+            entries.sort(key=lambda entry: entry[0])
+            index.keys[system] = [serial for serial, _ in entries]
+            index.titles[system] = [titles for _, titles in entries]
+        return index
+
+    def exact(self, system, serial_key):
+        """Return all (serial, title) matches whose serial equals serial_key."""
+        keys = self.keys.get(system)
+        if not keys:
+            return []
+        pos = bisect_left(keys, serial_key)
+        if pos < len(keys) and keys[pos] == serial_key:
+            return list(self.titles[system][pos])
+        return []
+
+    def prefix(self, system, serial_key):
+        """Return all (serial, title) matches whose serial starts with serial_key."""
+        keys = self.keys.get(system)
+        if not keys:
+            return []
+        matches = []
+        pos = bisect_left(keys, serial_key)
+        while pos < len(keys) and keys[pos].startswith(serial_key):
+            matches.extend(self.titles[system][pos])
+            pos += 1
+        return matches
+
+    def title_keys(self, system, serial_key, title):
+        """Return the stored (sanitized title, cleaned title, title key) of a matched game, or None."""
+        return self.stored_title_keys.get((system, title))
+
+class SqliteCatalog:
+    """Read-only catalog that answers serial lookups from games.db on demand via the (system, normalized_serial) index.
+
+    The connection is shared by the per-drive worker threads, so queries are serialized with a lock.
+    """
+
+    def __init__(self, db_path):
+        self.conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, check_same_thread=False)
+        self.lock = threading.Lock()
+        cursor = self.conn.execute("PRAGMA table_info(games)")
+        columns = [row[1] for row in cursor.fetchall()]
+        if "normalized_serial" in columns:
+            serial_expr = "normalized_serial"
+        else:
+            # Databases built before the column existed still work, just without the index
+            print(f"{db_path} has no normalized_serial column, lookups will scan the games table")
+            serial_expr = "UPPER(REPLACE(TRIM(serial), '_', ''))"
+        self.exact_sql = f"SELECT {serial_expr}, title FROM games WHERE system = ? AND {serial_expr} = ?"
+        self.prefix_sql = f"SELECT {serial_expr}, title FROM games WHERE system = ? AND {serial_expr} >= ? AND {serial_expr} < ? ORDER BY {serial_expr}"
+        self.title_keys_sql = None
+        if "title_key" in columns:
+            self.title_keys_sql = (f"SELECT sanitized_title, cleaned_title, title_key FROM games "
+                                   f"WHERE system = ? AND {serial_expr} = ? AND TRIM(title) = ? AND title_key IS NOT NULL")
+
+    def exact(self, system, serial_key):
+        """Return all (serial, title) matches whose serial equals serial_key."""
+        with self.lock:
+            rows = self.conn.execute(self.exact_sql, (system.upper(), serial_key)).fetchall()
+        return [(serial, title.strip()) for serial, title in rows]
+
+    def prefix(self, system, serial_key):
+        """Return all (serial, title) matches whose serial starts with serial_key."""
+        with self.lock:
+            rows = self.conn.execute(self.prefix_sql, (system.upper(), serial_key, serial_key + PREFIX_END)).fetchall()
+        return [(serial, title.strip()) for serial, title in rows]
+
+    def title_keys(self, system, serial_key, title):
+        """Return the stored (sanitized title, cleaned title, title key) of a matched game, or None."""
+        if self.title_keys_sql is None:
+            return None
+        with self.lock:
+            row = self.conn.execute(self.title_keys_sql, (system.upper(), serial_key, title)).fetchone()
+        return tuple(row) if row else None
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+class MmapSerialIndex:
+    """Serial catalog that binary-searches the memory-mapped games.idx file written by update_database."""
+
+    def __init__(self, index_path):
+        with open(index_path, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.key_width, system_count = INDEX_HEADER.unpack_from(self.data, 0)
+        if magic != INDEX_MAGIC or version != INDEX_VERSION:
+            self.data.close()
+            raise ValueError(f"{index_path} is not a version {INDEX_VERSION} RetroSpin serial index")
+        self.record_size = self.key_width + 4
+        self.systems = {}
+        for i in range(system_count):
+            code, count, offset = INDEX_SYSTEM.unpack_from(self.data, INDEX_HEADER.size + i * INDEX_SYSTEM.size)
+            self.systems[code.rstrip(b"\0").decode("ascii")] = (count, offset)
+
+    def _key(self, offset, pos):
+        start = offset + pos * self.record_size
+        return self.data[start:start + self.key_width]
+
+    def _strings(self, offset, pos, count):
+        """Read count consecutive length-prefixed strings from the title entry of a record."""
+        start = offset + pos * self.record_size + self.key_width
+        string_offset = struct.unpack_from("<I", self.data, start)[0]
+        strings = []
+        for _ in range(count):
+            (length,) = INDEX_TITLE_LENGTH.unpack_from(self.data, string_offset)
+            string_start = string_offset + INDEX_TITLE_LENGTH.size
+            strings.append(self.data[string_start:string_start + length].decode("utf-8"))
+            string_offset = string_start + length
+        return strings
+
+    def _title(self, offset, pos):
+        return self._strings(offset, pos, 1)[0]
+
+    def _lower_bound(self, count, offset, key):
+        lo, hi = 0, count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(offset, mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _scan(self, system, key, matches_key):
+        if system not in self.systems or len(key) > self.key_width:
+            return []
+        count, offset = self.systems[system]
+        matches = []
+        pos = self._lower_bound(count, offset, key)
+        while pos < count:
+            record_key = self._key(offset, pos)
+            if not matches_key(record_key):
+                break
+            matches.append((record_key.rstrip(b"\0").decode("ascii"), self._title(offset, pos)))
+            pos += 1
+        return matches
+
+    def exact(self, system, serial_key):
+        """Return all (serial, title) matches whose serial equals serial_key."""
+        key = serial_key.encode("ascii", "ignore").ljust(self.key_width, b"\0")
+        return self._scan(system, key, lambda record_key: record_key == key)
+
+    def prefix(self, system, serial_key):
+        """Return all (serial, title) matches whose serial starts with serial_key."""
+        key = serial_key.encode("ascii", "ignore")
+        return self._scan(system, key, lambda record_key: record_key.startswith(key))
+
+    def title_keys(self, system, serial_key, title):
+        """Return the stored (sanitized title, cleaned title, title key) of a matched game, or None."""
+        key = serial_key.encode("ascii", "ignore").ljust(self.key_width, b"\0")
+        if system not in self.systems or len(key) > self.key_width:
+            return None
+        count, offset = self.systems[system]
+        pos = self._lower_bound(count, offset, key)
+        while pos < count and self._key(offset, pos) == key:
+            strings = self._strings(offset, pos, 4)
+            if strings[0] == title:
+                return tuple(strings[1:])
+            pos += 1
+        return None
+
+    def close(self):
+        self.data.close()
+
+def get_index_path(db_path):
+    """Return the path of the serial index file that sits alongside games.db."""
+    return os.path.splitext(db_path)[0] + ".idx"
+
+def index_version(index_path):
+    """Return the format version of an existing games.idx, or None if it is missing or not a serial index."""
+    try:
+        with open(index_path, "rb") as f:
+            magic, version, _, _ = INDEX_HEADER.unpack(f.read(INDEX_HEADER.size))
+    except (OSError, struct.error):
+        return None
+    return version if magic == INDEX_MAGIC else None
+
+def write_serial_index(cursor, index_path):
+    """Write the games table as a games.idx serial index, replacing any existing file atomically."""
+    cursor.execute("SELECT system, normalized_serial, title, sanitized_title, cleaned_title, title_key FROM games "
+                   "WHERE normalized_serial IS NOT NULL")
+    grouped = {}
+    for system, serial, title, sanitized, cleaned, title_key in cursor.fetchall():
+        key = serial.encode("ascii", "ignore")
+        if key:
+            # The stored keys travel with the title so lookups never recompute them
+            entry = (title.strip(),) + ((sanitized, cleaned, title_key) if title_key is not None else title_keys(title.strip()))
+            grouped.setdefault(system.strip().lower(), []).append((key, entry))
+    key_width = max((len(key) for entries in grouped.values() for key, _ in entries), default=1)
+
+    titles = bytearray()
+    title_offsets = {}
+    records_size = sum(len(entries) for entries in grouped.values()) * (key_width + 4)
+    records_start = INDEX_HEADER.size + len(grouped) * INDEX_SYSTEM.size
+    titles_start = records_start + records_size
+
+    header = INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, key_width, len(grouped))
+    system_table = bytearray()
+    records = bytearray()
+    for system in sorted(grouped):
+        entries = sorted(grouped[system])
+        system_table += INDEX_SYSTEM.pack(system.encode("ascii"), len(entries), records_start + len(records))
+        for key, entry in entries:
+            if entry not in title_offsets:
+                title_offsets[entry] = titles_start + len(titles)
+                for string in entry:
+                    encoded = string.encode("utf-8")[:0xFFFF]
+                    titles += INDEX_TITLE_LENGTH.pack(len(encoded)) + encoded
+            records += key.ljust(key_width, b"\0") + struct.pack("<I", title_offsets[entry])
+
+    temp_path = index_path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(header)
+        f.write(system_table)
+        f.write(records)
+        f.write(titles)
+    # Replace rather than rewrite so running services keep their existing mapping valid
+    os.replace(temp_path, index_path)
+    return sum(len(entries) for entries in grouped.values())
+
+def open_catalog(mode=None):
+    """Open the serial catalog for the configured mode, falling back to the in-memory index."""
+    mode = mode or CATALOG_MODE
+    db_path = get_db_path()
+    index_path = get_index_path(db_path)
+    if mode == "auto":
+        index_current = os.path.exists(index_path) and (
+            not os.path.exists(db_path) or os.path.getmtime(index_path) >= os.path.getmtime(db_path))
+        mode = "mmap" if index_current else "sqlite"
+    if mode == "mmap":
+        try:
+            catalog = MmapSerialIndex(index_path)
+            print(f"Using memory-mapped serial index at {index_path}")
+            return catalog
+        except (OSError, ValueError) as e:
+            print(f"Error opening serial index at {index_path}: {e}. Falling back to SQLite catalog.")
+            mode = "sqlite"
+    if mode == "sqlite":
+        if os.path.exists(db_path):
+            try:
+                catalog = SqliteCatalog(db_path)
+                print(f"Using on-demand SQLite catalog at {db_path}")
+                return catalog
+            except sqlite3.Error as e:
+                print(f"Error opening SQLite catalog at {db_path}: {e}. Falling back to in-memory index.")
+        else:
+            print(f"Database file not found at {db_path}")
+            return SerialIndex()
+    return SerialIndex.from_game_titles(load_game_titles(), load_title_keys())
+
+def find_matches(catalog, system, game_serial):
+    """Look up the (serial, title) matches for a disc serial using the per-system matching rules."""
+    code = DB_SYSTEM_CODES.get(system, system)
+    serial_key = normalize_serial(game_serial)
+    # Saturn header serials are often truncated, so any DB serial starting with it is a match
+    if system == "saturn":
+        return catalog.prefix(code, serial_key)
+    candidates = [serial_key]
+    if system == "megacd":
+        candidates.append(serial_key.replace("-00", ""))  # US discs drop the -00 suffix in the DB
+    for candidate in candidates:
+        matches = catalog.exact(code, candidate)
+        if matches:
+            return matches
+    return catalog.prefix(code, serial_key)
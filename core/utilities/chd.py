@@ -0,0 +1,344 @@
+import io
+import os
+import zlib
+import lzma
+import struct
+
+# CHD v5 header (big endian): tag, length, version, compressors[4], logical bytes, map offset,
+# metadata offset, hunk bytes, unit bytes, raw SHA1, SHA1, parent SHA1
+CHD_MAGIC = b"MComprHD"
+CHD_HEADER_V5 = struct.Struct(">8sII4I3QII20s20s20s")
+CHD_MAP_HEADER = struct.Struct(">I6sHBBBx")  # compressed map bytes, first offset, map crc, length/self/parent bits
+
+# CD frames: 2352 bytes of sector data followed by 96 bytes of subcode
+CD_SECTOR_DATA = 2352
+CD_SUBCODE_DATA = 96
+CD_FRAME_SIZE = CD_SECTOR_DATA + CD_SUBCODE_DATA
+CD_SYNC_HEADER = b"\x00" + b"\xff" * 10 + b"\x00"
+
+# Hunk map entry types from MAME's chd.h
+COMPRESSION_TYPE_0 = 0
+COMPRESSION_TYPE_3 = 3
+COMPRESSION_NONE = 4
+COMPRESSION_SELF = 5
+COMPRESSION_PARENT = 6
+COMPRESSION_RLE_SMALL = 7
+COMPRESSION_RLE_LARGE = 8
+COMPRESSION_SELF_0 = 9
+COMPRESSION_SELF_1 = 10
+COMPRESSION_PARENT_SELF = 11
+COMPRESSION_PARENT_0 = 12
+COMPRESSION_PARENT_1 = 13
+
+# Hunks are small and cdlz/lzma streams have no header, so any dictionary of at least a hunk works
+LZMA_FILTERS = [{"id": lzma.FILTER_LZMA1, "dict_size": 1 << 24, "lc": 3, "lp": 0, "pb": 2}]
+
+class ChdError(Exception):
+    """Raised for CHD files that are malformed or use features this reader does not support."""
+
+# What corrupt or truncated hunk data and maps raise from the codecs and struct; reported as ChdError
+DECODE_ERRORS = (zlib.error, lzma.LZMAError, struct.error, IndexError, ValueError, EOFError)
+
+class BitReader:
+    """MSB-first bit reader over a byte string; reads past the end return zero bits, as in MAME."""
+
+    def __init__(self, data):
+        self.value = int.from_bytes(data, "big")
+        self.total = len(data) * 8
+        self.pos = 0
+
+    def read(self, count):
+        if count == 0:
+            return 0
+        start = self.pos
+        self.pos += count
+        if start >= self.total:
+            return 0
+        end = min(self.pos, self.total)
+        bits = (self.value >> (self.total - end)) & ((1 << (end - start)) - 1)
+        return bits << (self.pos - end)
+
+class HuffmanDecoder:
+    """Canonical Huffman decoder for the hunk map, with a tree imported in MAME's RLE format."""
+
+    def __init__(self, num_codes=16, max_bits=8):
+        self.num_codes = num_codes
+        self.max_bits = max_bits
+        self.codes = {}  # (length, code) -> symbol
+
+    def import_tree_rle(self, bits):
+        field_bits = 5 if self.max_bits >= 16 else 4 if self.max_bits >= 8 else 3
+        lengths = []
+        while len(lengths) < self.num_codes:
+            length = bits.read(field_bits)
+            if length != 1:
+                lengths.append(length)
+                continue
+            length = bits.read(field_bits)
+            if length == 1:
+                lengths.append(length)
+            else:
+                lengths.extend([length] * (bits.read(field_bits) + 3))
+        if len(lengths) != self.num_codes:
+            raise ChdError("Invalid hunk map Huffman tree")
+        # Assign canonical codes, longest codes first
+        histogram = [0] * 33
+        for length in lengths:
+            if length > self.max_bits:
+                raise ChdError("Invalid hunk map Huffman code length")
+            histogram[length] += 1
+        start = 0
+        for length in range(32, 0, -1):
+            next_start = (start + histogram[length]) >> 1
+            if length != 1 and next_start * 2 != start + histogram[length]:
+                raise ChdError("Invalid hunk map Huffman tree")
+            histogram[length] = start
+            start = next_start
+        for symbol, length in enumerate(lengths):
+            if length > 0:
+                self.codes[(length, histogram[length])] = symbol
+                histogram[length] += 1
+
+    def decode(self, bits):
+        code = 0
+        for length in range(1, self.max_bits + 1):
+            code = (code << 1) | bits.read(1)
+            symbol = self.codes.get((length, code))
+            if symbol is not None:
+                return symbol
+        raise ChdError("Invalid Huffman code in hunk map")
+
+def decompress_raw(codec, data, length):
+    """Decompress one codec stream (raw deflate or headerless LZMA) to length bytes."""
+    if codec in (b"zlib", b"cdzl"):
+        return zlib.decompressobj(-zlib.MAX_WBITS).decompress(data)[:length]
+    if codec in (b"lzma", b"cdlz"):
+        return lzma.LZMADecompressor(lzma.FORMAT_RAW, filters=LZMA_FILTERS).decompress(data, length)[:length]
+    raise ChdError(f"Unsupported CHD codec {codec.decode('ascii', 'replace')}")
+
+def decompress_cd_hunk(codec, data, hunk_bytes):
+    """Decompress a cdzl/cdlz hunk: sector data and subcode are stored as separate streams."""
+    frames = hunk_bytes // CD_FRAME_SIZE
+    complen_bytes = 2 if hunk_bytes < 65536 else 3
+    ecc_bytes = (frames + 7) // 8
+    header_bytes = ecc_bytes + complen_bytes
+    complen_base = int.from_bytes(data[ecc_bytes:header_bytes], "big")
+    base_codec = b"zlib" if codec == b"cdzl" else b"lzma"
+    sectors = decompress_raw(base_codec, data[header_bytes:header_bytes + complen_base], frames * CD_SECTOR_DATA)
+    # Subcode is not needed to read user data, so it is left zeroed
+    hunk = bytearray(hunk_bytes)
+    for frame in range(frames):
+        sector = sectors[frame * CD_SECTOR_DATA:(frame + 1) * CD_SECTOR_DATA]
+        hunk[frame * CD_FRAME_SIZE:frame * CD_FRAME_SIZE + len(sector)] = sector
+        if data[frame // 8] & (1 << (frame % 8)):
+            # The compressor dropped the sync header of sectors whose ECC it could regenerate
+            hunk[frame * CD_FRAME_SIZE:frame * CD_FRAME_SIZE + len(CD_SYNC_HEADER)] = CD_SYNC_HEADER
+    return bytes(hunk)
+
+class ChdReader:
+    """Reads hunks of a CHD v5 image (uncompressed, zlib, lzma, cdzl or cdlz); parent CHDs are not supported."""
+
+    def __init__(self, f):
+        self.f = f
+        header = f.read(CHD_HEADER_V5.size)
+        if len(header) < 16 or header[:8] != CHD_MAGIC:
+            raise ChdError("Not a CHD file")
+        version = struct.unpack_from(">I", header, 12)[0]
+        if version != 5 or len(header) < CHD_HEADER_V5.size:
+            raise ChdError(f"Unsupported CHD version {version}")
+        fields = CHD_HEADER_V5.unpack(header)
+        self.compressors = [struct.pack(">I", c) if c else None for c in fields[3:7]]
+        self.logical_bytes = fields[7]
+        self.map_offset = fields[8]
+        self.hunk_bytes = fields[10]
+        self.unit_bytes = fields[11]
+        if not self.hunk_bytes:
+            raise ChdError("Invalid CHD hunk size")
+        self.hunk_count = (self.logical_bytes + self.hunk_bytes - 1) // self.hunk_bytes
+        self.compressed = self.compressors[0] is not None
+        self.cache = {}
+        try:
+            if self.compressed:
+                self._read_compressed_map()
+            else:
+                self._read_uncompressed_map()
+        except DECODE_ERRORS as e:
+            raise ChdError(f"Corrupt CHD hunk map: {e}") from e
+
+    def _read_uncompressed_map(self):
+        self.f.seek(self.map_offset)
+        raw = self.f.read(self.hunk_count * 4)
+        self.entries = []
+        for hunk in range(self.hunk_count):
+            offset = struct.unpack_from(">I", raw, hunk * 4)[0] if hunk * 4 + 4 <= len(raw) else 0
+            self.entries.append((COMPRESSION_NONE, self.hunk_bytes, offset * self.hunk_bytes))
+
+    def _read_compressed_map(self):
+        self.f.seek(self.map_offset)
+        map_bytes, first_offset, _, length_bits, self_bits, parent_bits = CHD_MAP_HEADER.unpack(
+            self.f.read(CHD_MAP_HEADER.size))
+        bits = BitReader(self.f.read(map_bytes))
+        decoder = HuffmanDecoder()
+        decoder.import_tree_rle(bits)
+
+        # First pass: the compression type of every hunk, with run-length repeats
+        types = []
+        last_type = 0
+        repeat = 0
+        for hunk in range(self.hunk_count):
+            if repeat > 0:
+                types.append(last_type)
+                repeat -= 1
+                continue
+            value = decoder.decode(bits)
+            if value == COMPRESSION_RLE_SMALL:
+                types.append(last_type)
+                repeat = 2 + decoder.decode(bits)
+            elif value == COMPRESSION_RLE_LARGE:
+                types.append(last_type)
+                repeat = 2 + 16 + (decoder.decode(bits) << 4)
+                repeat += decoder.decode(bits)
+            else:
+                types.append(value)
+                last_type = value
+
+        # Second pass: lengths and offsets, which follow all the types in the bitstream
+        offset = int.from_bytes(first_offset, "big")
+        last_self = 0
+        last_parent = 0
+        self.entries = []
+        for hunk, hunk_type in enumerate(types):
+            length = 0
+            entry_offset = offset
+            if COMPRESSION_TYPE_0 <= hunk_type <= COMPRESSION_TYPE_3:
+                length = bits.read(length_bits)
+                offset += length
+                bits.read(16)  # crc
+            elif hunk_type == COMPRESSION_NONE:
+                length = self.hunk_bytes
+                offset += length
+                bits.read(16)  # crc
+            elif hunk_type == COMPRESSION_SELF:
+                last_self = entry_offset = bits.read(self_bits)
+            elif hunk_type == COMPRESSION_PARENT:
+                last_parent = entry_offset = bits.read(parent_bits)
+            elif hunk_type in (COMPRESSION_SELF_0, COMPRESSION_SELF_1):
+                if hunk_type == COMPRESSION_SELF_1:
+                    last_self += 1
+                hunk_type = COMPRESSION_SELF
+                entry_offset = last_self
+            elif hunk_type == COMPRESSION_PARENT_SELF:
+                hunk_type = COMPRESSION_PARENT
+                last_parent = entry_offset = (hunk * self.hunk_bytes) // self.unit_bytes
+            elif hunk_type in (COMPRESSION_PARENT_0, COMPRESSION_PARENT_1):
+                if hunk_type == COMPRESSION_PARENT_1:
+                    last_parent += self.hunk_bytes // self.unit_bytes
+                hunk_type = COMPRESSION_PARENT
+                entry_offset = last_parent
+            else:
+                raise ChdError(f"Invalid hunk map entry type {hunk_type}")
+            self.entries.append((hunk_type, length, entry_offset))
+
+    def read_hunk(self, hunk):
+        """Return the decompressed bytes of one hunk."""
+        if hunk in self.cache:
+            return self.cache[hunk]
+        if not 0 <= hunk < self.hunk_count:
+            raise ChdError(f"Hunk {hunk} out of range")
+        try:
+            data = self._decode_hunk(hunk)
+        except DECODE_ERRORS as e:
+            raise ChdError(f"Corrupt CHD hunk {hunk}: {e}") from e
+        # Identification reads a handful of neighbouring sectors, so a small cache is enough
+        if len(self.cache) >= 8:
+            self.cache.pop(next(iter(self.cache)))
+        self.cache[hunk] = data
+        return data
+
+    def _decode_hunk(self, hunk):
+        hunk_type, length, offset = self.entries[hunk]
+        if hunk_type == COMPRESSION_SELF:
+            # A self reference always points back to an earlier hunk
+            if offset >= hunk:
+                raise ChdError(f"Hunk {hunk} refers to hunk {offset}")
+            data = self.read_hunk(offset)
+        elif hunk_type == COMPRESSION_PARENT:
+            raise ChdError("CHD files with a parent are not supported")
+        elif hunk_type == COMPRESSION_NONE:
+            if not self.compressed and offset == 0:
+                data = bytes(self.hunk_bytes)
+            else:
+                self.f.seek(offset)
+                data = self.f.read(self.hunk_bytes)
+        else:
+            codec = self.compressors[hunk_type]
+            if codec is None:
+                raise ChdError(f"Hunk {hunk} uses an undefined compressor")
+            self.f.seek(offset)
+            compressed = self.f.read(length)
+            if codec in (b"cdzl", b"cdlz"):
+                data = decompress_cd_hunk(codec, compressed, self.hunk_bytes)
+            else:
+                data = decompress_raw(codec, compressed, self.hunk_bytes)
+        return data
+
+    def read_frame(self, frame):
+        """Return the 2352 bytes of sector data of a CD frame."""
+        frames_per_hunk = self.hunk_bytes // CD_FRAME_SIZE
+        hunk, index = divmod(frame, frames_per_hunk)
+        start = index * CD_FRAME_SIZE
+        return self.read_hunk(hunk)[start:start + CD_SECTOR_DATA]
+
+class ChdCdFile(io.RawIOBase):
+    """Read-only stream of the 2352-byte sectors of a CD CHD (subcode removed), like a raw .bin dump."""
+
+    def __init__(self, path):
+        super().__init__()
+        self.file = open(path, "rb")
+        try:
+            self.chd = ChdReader(self.file)
+        except Exception:
+            self.file.close()
+            raise
+        if self.chd.unit_bytes != CD_FRAME_SIZE or self.chd.hunk_bytes % CD_FRAME_SIZE:
+            self.file.close()
+            raise ChdError(f"{path} is not a CD image")
+        self.size = self.chd.logical_bytes // CD_FRAME_SIZE * CD_SECTOR_DATA
+        self.pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self.pos
+        elif whence == os.SEEK_END:
+            offset += self.size
+        self.pos = max(offset, 0)
+        return self.pos
+
+    def tell(self):
+        return self.pos
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.size - self.pos
+        size = max(min(size, self.size - self.pos), 0)
+        chunks = []
+        while size > 0:
+            frame, offset = divmod(self.pos, CD_SECTOR_DATA)
+            chunk = self.chd.read_frame(frame)[offset:offset + size]
+            if not chunk:
+                break
+            chunks.append(chunk)
+            self.pos += len(chunk)
+            size -= len(chunk)
+        return b"".join(chunks)
+
+    def close(self):
+        if not self.closed:
+            self.file.close()
+        super().close()
@@ -1,10 +1,14 @@
 import sqlite3
 import os
+from core.utilities.titles import title_keys
 
 DATA_DIR = "data"
 DAT_DIR = os.path.join(DATA_DIR, "dat")
 DB_PATH = os.path.join(DATA_DIR, "games.db")
 
+# Stored in PRAGMA user_version; databases below it run the migrations in create_table_schema once
+SCHEMA_VERSION = 2
+
 def connect_to_database():
     """Connect to games.db and return connection and cursor."""
     conn = sqlite3.connect(DB_PATH)
@@ -31,9 +35,19 @@ def create_table_schema(cursor):
             region TEXT,
             system TEXT,
             language TEXT,
+            normalized_serial TEXT,
+            sanitized_title TEXT,
+            cleaned_title TEXT,
+            title_key TEXT,
             PRIMARY KEY (serial, system)
         )
     ''')
+    cursor.execute("PRAGMA user_version")
+    if cursor.fetchone()[0] < SCHEMA_VERSION:
+        migrate_normalized_serial(cursor)
+        migrate_title_keys(cursor)
+        cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    create_indexes(cursor)
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS unknown (
             serial TEXT,
@@ -55,6 +69,39 @@ def create_table_schema(cursor):
         )
     ''')
 
+def migrate_normalized_serial(cursor):
+    """Add and backfill the normalized_serial column on databases built before it existed."""
+    cursor.execute("PRAGMA table_info(games)")
+    columns = [row[1] for row in cursor.fetchall()]
+    if "normalized_serial" not in columns:
+        cursor.execute("ALTER TABLE games ADD COLUMN normalized_serial TEXT")
+        cursor.execute("UPDATE games SET normalized_serial = UPPER(REPLACE(TRIM(serial), '_', ''))")
+
+def migrate_title_keys(cursor):
+    """Add and backfill the title key columns (see titles.title_keys) on databases built before they existed."""
+    cursor.execute("PRAGMA table_info(games)")
+    columns = [row[1] for row in cursor.fetchall()]
+    for column in ("sanitized_title", "cleaned_title", "title_key"):
+        if column not in columns:
+            cursor.execute(f"ALTER TABLE games ADD COLUMN {column} TEXT")
+    cursor.execute("SELECT DISTINCT title FROM games WHERE title_key IS NULL")
+    titles = [row[0] for row in cursor.fetchall() if row[0] is not None]
+    if titles:
+        print(f"Computing title keys for {len(titles)} titles...")
+        cursor.executemany("UPDATE games SET sanitized_title = ?, cleaned_title = ?, title_key = ? WHERE title = ?",
+                           [title_keys(title) + (title,) for title in titles])
+    # Keys are read alongside the serial lookup, so earlier builds' title indexes are never used
+    cursor.execute("DROP INDEX IF EXISTS idx_games_system_title_key")
+    cursor.execute("DROP INDEX IF EXISTS idx_games_system_cleaned_title")
+
+def create_indexes(cursor):
+    """Create the lookup index used by the runtime catalog."""
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_games_system_serial ON games (system, normalized_serial)")
+
+def drop_indexes(cursor):
+    """Drop lookup indexes so bulk loads don't maintain them row by row."""
+    cursor.execute("DROP INDEX IF EXISTS idx_games_system_serial")
+
 def load_game_titles():
     """Load game serial to title mappings from SQLite database, allowing multiple matches."""
     game_titles = {}
@@ -80,4 +127,21 @@ def load_game_titles():
         conn.close()
     except Exception as e:
         print(f"Error loading game titles from database: {e}")
-    return game_titles
\ No newline at end of file
+    return game_titles
+
+def load_title_keys():
+    """Load the stored (sanitized title, cleaned title, title key) of every game as {(system, title): keys}."""
+    title_keys_by_title = {}
+    db_path = get_db_path()
+    if not os.path.exists(db_path):
+        return title_keys_by_title
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        cursor.execute("SELECT system, title, sanitized_title, cleaned_title, title_key FROM games WHERE title_key IS NOT NULL")
+        for system, title, sanitized, cleaned, key in cursor.fetchall():
+            title_keys_by_title[(system.strip().lower(), title.strip())] = (sanitized, cleaned, key)
+        conn.close()
+    except Exception as e:
+        print(f"Error loading title keys from database: {e}")
+    return title_keys_by_title
\ No newline at end of file
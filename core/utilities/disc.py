@@ -1,9 +1,13 @@
 import os
 import re
-import subprocess
 import time
-from core.utilities.database import load_game_titles
+from core.utilities.catalog import open_catalog, find_matches
 from core.utilities.ui import show_message
+from core.utilities.drives import enumerate_optical_drives
+from core.utilities.media import get_drive_status, CDS_DISC_OK
+from core.utilities.iso9660 import IsoReader, IsoError
+from core.utilities import mounts
+from core.utilities.sectors import open_sectors
 
 def log(message):
     """Log messages to /tmp/retrospin_err.log instead of console."""
@@ -12,16 +16,13 @@ def log(message):
     #    f.write(f"{time.strftime('%Y-%m-%d %H:%M:%S')} - disc.py: {message}\n")
 
 def get_optical_drive():
-    """Detect an optical drive on MiSTer using lsblk."""
+    """Detect an optical drive on MiSTer from sysfs."""
     try:
-        result = subprocess.run(['lsblk', '-d', '-o', 'NAME,TYPE'], capture_output=True, text=True, check=True)
-        lines = result.stdout.splitlines()
-        for line in lines[1:]:
-            parts = line.split()
-            if len(parts) >= 2 and parts[1] == "rom":
-                dev_path = f"/dev/{parts[0]}"
-                log(f"Detected optical drive: {dev_path}")
-                return dev_path
+        drives = enumerate_optical_drives()
+        if drives:
+            drive = drives[0]
+            log(f"Detected optical drive: {drive['path']} ({drive['vendor']} {drive['model']})".rstrip())
+            return drive["path"]
         log("No optical drive detected.")
         show_message("No optical drive detected.", title="Retrospin")
         return None
@@ -31,7 +32,10 @@ def get_optical_drive():
         return None
 
 def is_disc_present(drive_path):
-    """Check if a disc is present in the drive."""
+    """Check if a disc is present in the drive, via CDROM_DRIVE_STATUS when supported."""
+    status = get_drive_status(drive_path)
+    if status is not None:
+        return status == CDS_DISC_OK
     try:
         with open(drive_path, 'rb') as f:
             f.read(1)  # Try reading a byte to check if disc is accessible
@@ -42,24 +46,61 @@ def is_disc_present(drive_path):
 
 def is_mounted(drive_path, mount_point):
     """Check if the drive is already mounted at the mount point."""
+    return mounts.is_mounted(drive_path, mount_point)
+
+def parse_system_cnf(file_text):
+    """Extract the PSX serial from the BOOT line of SYSTEM.CNF (e.g. cdrom:\\SLUS_005.94;1 -> SLUS-00594)."""
+    for line in file_text.splitlines():
+        key, sep, value = line.partition("=")
+        if not sep or key.strip().upper() not in ("BOOT", "BOOT2"):
+            continue
+        # Boot paths look like cdrom:\SLUS_005.94;1, cdrom0:\SLUS_005.94;1 or cdrom:SLUS_005.94
+        boot_path = value.strip().split(":", 1)[-1]
+        raw_id = re.split(r"[\\/]", boot_path)[-1].split(";")[0].strip()
+        if raw_id:
+            return raw_id.replace(".", "").replace("_", "-")
+    return None
+
+def parse_psx_volume(iso):
+    """Read PSX game serial and volume name from SYSTEM.CNF in the root of an IsoReader volume."""
+    data = iso.read_file("SYSTEM.CNF")
+    if data is None:
+        log(f"No SYSTEM.CNF in the root directory (volume {iso.volume_id!r})")
+        return None, iso.volume_id
+    game_serial = parse_system_cnf(data.decode('latin-1'))
+    if game_serial:
+        log(f"Extracted PSX Game Serial: {game_serial}")
+    else:
+        log("No BOOT line in SYSTEM.CNF")
+    return game_serial, iso.volume_id
+
+def read_psx_system_cnf(drive_path):
+    """Read PSX game serial and volume name from SYSTEM.CNF by parsing ISO9660 straight from the disc."""
+    with open_sectors(drive_path) as f:
+        return parse_psx_volume(IsoReader(f))
+
+def read_psx_disc_info(drive_path):
+    """Read PSX game serial and disc name, falling back to mounting the disc if it cannot be parsed directly."""
     try:
-        result = subprocess.run(['mount'], capture_output=True, text=True, check=True)
-        return f"{drive_path} on {mount_point}" in result.stdout
-    except Exception as e:
-        log(f"Error checking mount status: {e}")
-        return False
+        return read_psx_system_cnf(drive_path)
+    except (OSError, IsoError) as e:
+        log(f"Direct ISO9660 read of {drive_path} failed: {e}. Falling back to mount...")
+    return read_psx_game_id_mounted(drive_path), None
 
 def read_psx_game_id(drive_path):
-    """Read PSX game serial and disc name from system.cnf on physical disc."""
+    """Read PSX game serial from system.cnf on physical disc."""
+    return read_psx_disc_info(drive_path)[0]
+
+def read_psx_game_id_mounted(drive_path):
+    """Read PSX game serial from system.cnf by mounting the physical disc."""
     mount_point = "/mnt/cdrom"
-    disc_name = None
     game_serial = None
     try:
         # Unmount if already mounted
         if is_mounted(drive_path, mount_point):
             log(f"{drive_path} already mounted on {mount_point}, attempting to unmount...")
             os.system(f"umount -f {mount_point} 2>/dev/null")
-        else:
+        elif mounts.is_mount_point(mount_point):
             os.system(f"umount {mount_point} 2>/dev/null")
         if not os.path.exists(mount_point):
             os.makedirs(mount_point)
@@ -103,12 +144,9 @@ def read_psx_game_id(drive_path):
                         with open(system_cnf_path, 'r', encoding='latin-1', errors='ignore') as f:
                             file_text = f.read()
                             log(f"Found {variant} at {system_cnf_path}")
-                            for line in file_text.splitlines():
-                                if "BOOT" in line.upper():
-                                    raw_id = line.split("=")[1].strip().split("\\")[1].split(";")[0]
-                                    game_serial = raw_id.replace(".", "").replace("_", "-")
-                                    log(f"Extracted PSX Game Serial: {game_serial}")
-                                    break
+                            game_serial = parse_system_cnf(file_text)
+                            if game_serial:
+                                log(f"Extracted PSX Game Serial: {game_serial}")
                     except Exception as e:
                         log(f"Error reading {system_cnf_path}: {e}")
                     if game_serial:
@@ -134,46 +172,49 @@ def read_psx_game_id(drive_path):
             log(f"Final cleanup: Forcing unmount of {mount_point}")
             os.system(f"umount -f {mount_point} 2>/dev/null")
 
+def parse_saturn_header(sector):
+    """Extract the Saturn game serial from a sector 0 header (offset 0x20-0x2A)."""
+    # Saturn: offset 0x20-0x2A (32-42)
+    raw_id = sector[32:42].decode('ascii', errors='ignore').strip()
+    print(f"Saturn raw serial: {repr(raw_id)}")
+    # Match formats like T-12345, MK-81009, GS-9051
+    if not re.match(r'^[A-Z0-9]+-[A-Z0-9]+$', raw_id):
+        print("No valid Saturn serial found in disc header (invalid or empty).")
+        return None
+    print(f"Extracted Saturn Game Serial: {raw_id}")
+    return raw_id
+
+def parse_mcd_header(sector):
+    """Extract the Sega CD game serial from a sector 0 header (offset 0x180)."""
+    # Sega CD: offset 0x180 (384-400)
+    raw_id = sector[384:400].decode('ascii', errors='ignore').strip()
+    print(f"Sega CD raw serial: {repr(raw_id)}")
+    # Match formats like T-70065, GM-12345, or raw serials (e.g., 12345)
+    match = re.match(r'^(?:GM|T-)?\s*([A-Z0-9-]+)(?:\s*-\d+)?\s*$', raw_id)
+    game_serial = match.group(1) if match else None
+    # Validate serial
+    if not game_serial or not re.match(r'^[A-Z0-9-]+$', game_serial):
+        print("No valid Sega CD serial found in disc header (invalid or empty).")
+        return None
+    print(f"Extracted Sega CD Game Serial: {game_serial}")
+    return game_serial
+
 def read_saturn_game_id(drive_path):
-    """Read Saturn game serial from disc header (offset 0x20-0x2A)."""
+    """Read Saturn game serial from disc header (offset 0x20-0x2A) of a drive or cooked/raw image."""
     try:
-        with open(drive_path, 'rb') as f:
+        with open_sectors(drive_path) as f:
             f.seek(0)  # Sector 0
-            sector = f.read(2048)
-            # Saturn: offset 0x20-0x2A (32-42)
-            raw_id = sector[32:42].decode('ascii', errors='ignore').strip()
-            print(f"Saturn raw serial: {repr(raw_id)}")
-            # Match formats like T-12345, MK-81009, GS-9051
-            match = re.match(r'^[A-Z0-9]+-[A-Z0-9]+$', raw_id)
-            game_serial = raw_id if match else None
-            # Validate serial
-            if not game_serial or not re.match(r'^[A-Z0-9]+-[A-Z0-9]+$', game_serial):
-                print("No valid Saturn serial found in disc header (invalid or empty).")
-                return None
-            print(f"Extracted Saturn Game Serial: {game_serial}")
-            return game_serial
+            return parse_saturn_header(f.read(2048))
     except Exception as e:
         print(f"Error reading Saturn disc: {e}")
         return None
 
 def read_mcd_game_id(drive_path):
-    """Read Sega CD game serial from disc header (offset 0x180)."""
+    """Read Sega CD game serial from disc header (offset 0x180) of a drive or cooked/raw image."""
     try:
-        with open(drive_path, 'rb') as f:
+        with open_sectors(drive_path) as f:
             f.seek(0)  # Sector 0
-            sector = f.read(2048)
-            # Sega CD: offset 0x180 (384-400)
-            raw_id = sector[384:400].decode('ascii', errors='ignore').strip()
-            print(f"Sega CD raw serial: {repr(raw_id)}")
-            # Match formats like T-70065, GM-12345, or raw serials (e.g., 12345)
-            match = re.match(r'^(?:GM|T-)?\s*([A-Z0-9-]+)(?:\s*-\d+)?\s*$', raw_id)
-            game_serial = match.group(1) if match else None
-            # Validate serial
-            if not game_serial or not re.match(r'^[A-Z0-9-]+$', game_serial):
-                print("No valid Sega CD serial found in disc header (invalid or empty).")
-                return None
-            print(f"Extracted Sega CD Game Serial: {game_serial}")
-            return game_serial
+            return parse_mcd_header(f.read(2048))
     except Exception as e:
         print(f"Error reading Sega CD disc: {e}")
         return None
@@ -191,7 +232,7 @@ def read_disc():
     show_message("Reading disc...", title="Retrospin", non_blocking=True)
     
     try:
-        game_titles = load_game_titles()
+        catalog = open_catalog()
     except Exception as e:
         log(f"Error loading game titles: {e}")
         show_message(f"Error loading database: {str(e)}", title="Retrospin")
@@ -199,13 +240,10 @@ def read_disc():
     
     # Try PSX only for now
     try:
-        psx_game_serial, disc_name = read_psx_game_id(drive_path)
+        psx_game_serial, disc_name = read_psx_disc_info(drive_path)
         if psx_game_serial:
             serial_key = psx_game_serial.replace("_", "").upper()
-            matches = []
-            for (db_serial, db_system), titles in game_titles.items():
-                if db_system == "psx" and (db_serial == serial_key or db_serial.startswith(serial_key)):
-                    matches.extend(titles)
+            matches = find_matches(catalog, "psx", psx_game_serial)
             if matches:
                 # Pick first match, log if multiple
                 if len(matches) > 1:
@@ -0,0 +1,241 @@
+import os
+import errno
+import select
+import socket
+import time
+from core.utilities.inotify import Inotify, IN_CREATE, IN_DELETE, IN_Q_OVERFLOW
+
+NETLINK_KOBJECT_UEVENT = 15
+UEVENT_KERNEL_GROUP = 1
+
+SYS_BLOCK_DIR = "/sys/block"
+DEV_DIR = "/dev"
+
+# SCSI peripheral device type for CD/DVD drives (/sys/block/<name>/device/type)
+SCSI_TYPE_ROM = "5"
+
+# Event action reported by a source that dropped events; the watcher re-enumerates the drives
+RESYNC = "resync"
+
+# sys_block_dir -> (directory listing, drives) from the last enumeration
+_drive_cache = {}
+
+def log(message):
+    print(message)
+
+def read_sysfs_attribute(path):
+    """Read a sysfs attribute, returning an empty string if it is missing."""
+    try:
+        with open(path, "r") as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+def is_optical_device(name, sys_block_dir=SYS_BLOCK_DIR):
+    """Return True if the block device name is an optical drive, checking sysfs and falling back to the sr* name."""
+    device_type = read_sysfs_attribute(os.path.join(sys_block_dir, name, "device", "type"))
+    if device_type:
+        return device_type == SCSI_TYPE_ROM
+    return name.startswith("sr")
+
+def enumerate_optical_drives(sys_block_dir=SYS_BLOCK_DIR):
+    """Return every optical drive as {"path", "name", "vendor", "model"} by reading sysfs, without spawning lsblk.
+
+    Results are cached against the /sys/block listing, so repeated calls cost a single listdir
+    until a block device is added or removed.
+    """
+    try:
+        names = tuple(sorted(os.listdir(sys_block_dir)))
+    except OSError as e:
+        log(f"Error reading {sys_block_dir}: {e}")
+        return []
+    cached = _drive_cache.get(sys_block_dir)
+    if cached and cached[0] == names:
+        return list(cached[1])
+    drives = []
+    for name in names:
+        device_dir = os.path.join(sys_block_dir, name, "device")
+        if read_sysfs_attribute(os.path.join(device_dir, "type")) != SCSI_TYPE_ROM:
+            continue
+        drives.append({
+            "path": os.path.join(DEV_DIR, name),
+            "name": name,
+            "vendor": read_sysfs_attribute(os.path.join(device_dir, "vendor")),
+            "model": read_sysfs_attribute(os.path.join(device_dir, "model"))
+        })
+    _drive_cache[sys_block_dir] = (names, drives)
+    return list(drives)
+
+def list_optical_drives(sys_block_dir=SYS_BLOCK_DIR):
+    """Return the device paths of all optical drives."""
+    return [drive["path"] for drive in enumerate_optical_drives(sys_block_dir)]
+
+class NetlinkEventSource:
+    """Kernel block-device uevents (add/remove/change) read from a NETLINK_KOBJECT_UEVENT socket."""
+
+    def __init__(self):
+        self.sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_KOBJECT_UEVENT)
+        self.sock.setblocking(False)
+        self.sock.bind((0, UEVENT_KERNEL_GROUP))
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def read_events(self):
+        """Return pending (action, device name, properties) events for block devices."""
+        events = []
+        while True:
+            try:
+                data = self.sock.recv(64 * 1024)
+            except BlockingIOError:
+                return events
+            except OSError as e:
+                if e.errno == errno.ENOBUFS:
+                    # A burst of uevents overflowed the socket buffer and some were dropped
+                    log("Drive uevents were lost, re-enumerating drives")
+                    events.append((RESYNC, "", {}))
+                else:
+                    log(f"Error reading drive uevents: {e}")
+                return events
+            fields = data.split(b"\0")
+            props = {}
+            for field in fields[1:]:
+                key, sep, value = field.partition(b"=")
+                if sep:
+                    props[key.decode(errors="ignore")] = value.decode(errors="ignore")
+            if props.get("SUBSYSTEM") == "block" and props.get("DEVNAME"):
+                events.append((props.get("ACTION", ""), os.path.basename(props["DEVNAME"]), props))
+
+    def close(self):
+        self.sock.close()
+
+class InotifyEventSource:
+    """Device node add/remove events from inotify on /dev, for systems where netlink is unavailable."""
+
+    def __init__(self, dev_dir=DEV_DIR):
+        self.inotify = Inotify()
+        self.inotify.add_watch(dev_dir, IN_CREATE | IN_DELETE)
+
+    def fileno(self):
+        return self.inotify.fileno()
+
+    def read_events(self):
+        """Return pending (action, device name, properties) events for /dev entries."""
+        events = []
+        try:
+            raw_events = self.inotify.read_events()
+        except OSError as e:
+            log(f"Error reading {DEV_DIR} events: {e}")
+            return events
+        for wd, mask, cookie, name in raw_events:
+            if mask & IN_Q_OVERFLOW:
+                log(f"{DEV_DIR} events were lost, re-enumerating drives")
+                events.append((RESYNC, "", {}))
+            elif name:
+                events.append(("add" if mask & IN_CREATE else "remove", name, {}))
+        return events
+
+    def close(self):
+        self.inotify.close()
+
+class FakeEventSource:
+    """Scriptable event source for exercising DriveWatcher without hardware; push() wakes a waiting watcher."""
+
+    def __init__(self):
+        self.read_fd, self.write_fd = os.pipe()
+        self.pending = []
+
+    def push(self, action, name, **props):
+        self.pending.append((action, name, props))
+        os.write(self.write_fd, b"\0")
+
+    def fileno(self):
+        return self.read_fd
+
+    def read_events(self):
+        os.read(self.read_fd, 4096)
+        events, self.pending = self.pending, []
+        return events
+
+    def close(self):
+        os.close(self.read_fd)
+        os.close(self.write_fd)
+
+def create_event_source():
+    """Open the best available drive event source: kernel uevents, then inotify on /dev, else None (polling)."""
+    for source_class in (NetlinkEventSource, InotifyEventSource):
+        try:
+            return source_class()
+        except OSError as e:
+            log(f"{source_class.__name__} unavailable: {e}")
+    return None
+
+class DriveWatcher:
+    """Tracks the set of optical drives from device events and wakes callers only when something changes."""
+
+    def __init__(self, source=None, enumerate_drives=list_optical_drives, is_optical=is_optical_device, poll_interval=5):
+        self.source = source if source is not None else create_event_source()
+        self.enumerate_drives = enumerate_drives
+        self.is_optical = is_optical
+        self.poll_interval = poll_interval
+        self.drives = set(self._enumerate())
+
+    def _enumerate(self):
+        try:
+            return self.enumerate_drives()
+        except Exception as e:
+            log(f"Error enumerating optical drives: {e}")
+            return []
+
+    def resync(self):
+        """Re-enumerate the drives and return the paths added or removed since the last known set."""
+        drives = set(self._enumerate())
+        changed = drives ^ self.drives
+        self.drives = drives
+        return changed
+
+    def current_drives(self):
+        """Return the known optical drive paths, sorted."""
+        return sorted(self.drives)
+
+    def apply_event(self, action, name, props):
+        """Update the drive set from one event and return the drive path it affected, or None."""
+        dev_path = os.path.join(DEV_DIR, name)
+        if action == "remove":
+            if dev_path in self.drives:
+                self.drives.discard(dev_path)
+                log(f"Optical drive removed: {dev_path}")
+                return dev_path
+            return None
+        if dev_path not in self.drives:
+            if action in ("add", "change") and self.is_optical(name):
+                self.drives.add(dev_path)
+                log(f"Optical drive added: {dev_path}")
+                return dev_path
+            return None
+        # Media change / eject request on a known drive
+        if action == "change":
+            return dev_path
+        return None
+
+    def wait(self, timeout=None):
+        """Block until a drive is added, removed or reports a media change (or timeout) and return the changed paths."""
+        if self.source is None:
+            # No event source: re-enumerate at most every poll_interval seconds
+            time.sleep(self.poll_interval if timeout is None else min(timeout, self.poll_interval))
+            return self.resync()
+        readable, _, _ = select.select([self.source], [], [], timeout)
+        changed = set()
+        if readable:
+            for action, name, props in self.source.read_events():
+                if action == RESYNC:
+                    changed |= self.resync()
+                    continue
+                dev_path = self.apply_event(action, name, props)
+                if dev_path:
+                    changed.add(dev_path)
+        return changed
+
+    def close(self):
+        if self.source is not None:
+            self.source.close()
@@ -1,5 +1,7 @@
 import os
-import re
+from core.utilities.library import get_library, LibraryWatcher
+from core.utilities.scanner import ContentIndex
+from core.utilities.titles import fold_title, title_keys
 
 PSX_GAME_PATHS = [
     "/media/fat/games/PSX/",
@@ -14,101 +16,110 @@ MCD_GAME_PATHS = [
     "/media/usb0/games/MegaCD/"
 ]
 
-def clean_game_title(title):
-    """Remove language mappings, (Beta), (Rev *), dates, and malformed tags from the title, preserving region."""
-    cleaned = title
-    # Remove language tags (e.g., (En,Fr,De,Es,It), (Ja))
-    cleaned = re.sub(r'\s*\((?:En|Fr|De|Es|It|Ja|Ko|Zh)(?:,[A-Za-z]+)*\)\s*$', '', cleaned, flags=re.IGNORECASE)
-    # Remove (Beta)
-    cleaned = re.sub(r'\s*\(Beta\)\s*$', '', cleaned, flags=re.IGNORECASE)
-    # Remove (Rev <number>) (e.g., (Rev 1), (Rev 123))
-    cleaned = re.sub(r'\s*\(Rev\s+\d+\)\s*$', '', cleaned, flags=re.IGNORECASE)
-    # Remove date tags (e.g., (2000-08-21))
-    cleaned = re.sub(r'\s*\(\d{4}-\d{2}-\d{2}\)\s*$', '', cleaned)
-    # Remove malformed or incomplete tags (e.g., (Rev, (, (USA)
-    cleaned = re.sub(r'\s*\([^\)]*?\s*$', '', cleaned)
-    return cleaned.strip()
+# Resolve game files from the persistent library index; "0" searches the folders directly on every launch
+USE_LIBRARY_INDEX = os.environ.get("RETROSPIN_LIBRARY_INDEX", "1") != "0"
 
-def find_game_file(title, system):
-    """Search for .chd or complete .cue/.bin game files based on system, including subfolders."""
-    paths = {
-        "psx": PSX_GAME_PATHS,
-        "saturn": SATURN_GAME_PATHS,
-        "megacd": MCD_GAME_PATHS
-    }[system]
+# Find local images by the serial read from their contents before matching titles; "0" matches titles only
+USE_CONTENT_INDEX = os.environ.get("RETROSPIN_CONTENT_INDEX", "1") != "0"
+
+SYSTEM_GAME_PATHS = {
+    "psx": PSX_GAME_PATHS,
+    "saturn": SATURN_GAME_PATHS,
+    "megacd": MCD_GAME_PATHS
+}
+
+def resolve_game_file(keys, paths):
+    """Find the best game file for folded title keys with one scandir traversal per base path.
+
+    Candidates are ranked by key order, then .chd before a complete .cue/.bin pair, matching the
+    order the separate searches used to run in. Returns (path, kind, key index) or None, and prints how
+    many directories and entries were read.
+    """
+    # (folded title key, extension) -> (rank, kind, key index)
+    wanted = {}
+    for i, key in enumerate(keys):
+        wanted.setdefault((key, ".chd"), (i * 2, "chd", i))
+        wanted.setdefault((key, ".cue"), (i * 2 + 1, "cue", i))
+    best = None
+    dir_count = 0
+    entry_count = 0
+    for base_path in paths:
+        stack = [base_path]
+        while stack:
+            directory = stack.pop()
+            try:
+                with os.scandir(directory) as entries:
+                    dir_count += 1
+                    names = {}
+                    for entry in entries:
+                        entry_count += 1
+                        try:
+                            if entry.is_dir():
+                                stack.append(entry.path)
+                                continue
+                        except OSError:
+                            continue
+                        stem, ext = os.path.splitext(entry.name)
+                        names[(fold_title(stem), ext.lower())] = entry.name
+            except OSError:
+                continue
+            for key, name in names.items():
+                hit = wanted.get(key)
+                if not hit or (best and hit[0] >= best[0]):
+                    continue
+                rank, kind, key_index = hit
+                if kind == "cue" and (key[0], ".bin") not in names:
+                    print(f"Found .cue without .bin: {os.path.join(directory, name)}")
+                    continue
+                best = (rank, os.path.join(directory, name), kind, key_index)
+            if best and best[0] == 0:
+                # Nothing can outrank a full-title .chd
+                stack = []
+        if best and best[0] == 0:
+            break
+    print(f"Searched {dir_count} directories ({entry_count} entries) for {keys}")
+    return best[1:] if best else None
+
+def find_game_file(title, system, keys=None):
+    """Look up a .chd or complete .cue/.bin game file for the title in the library index or game folders.
+
+    keys are the (sanitized title, cleaned title, title key) the catalog stored for the game; they are
+    computed from the title when not given.
+    """
+    if system not in SYSTEM_GAME_PATHS:
+        raise KeyError(system)
     
-    # Sanitize title for filename use (keep parentheses, spaces, hyphens)
-    safe_title = re.sub(r'[<>:"/\\|?*]', '', title).strip()
+    safe_title, safe_cleaned_title, full_key = keys or title_keys(title)
     print(f"Searching for game file with full title: {safe_title}")
     
-    # Try full title first
-    # Check for .chd in base paths and subfolders
-    game_filename = f"{safe_title}.chd"
-    for base_path in paths:
-        for root, dirs, files in os.walk(base_path):
-            if game_filename in files:
-                game_file = os.path.join(root, game_filename)
-                print(f"Found .chd game file with full title: {game_file}")
-                if os.access(game_file, os.R_OK):
-                    print(f"Game file {game_file} is readable")
-                else:
-                    print(f"Game file {game_file} is not readable")
-                return game_file
-    
-    # Check for .cue and corresponding .bin in base paths and subfolders
-    game_filename = f"{safe_title}.cue"
-    for base_path in paths:
-        for root, dirs, files in os.walk(base_path):
-            if game_filename in files:
-                cue_file = os.path.join(root, game_filename)
-                bin_filename = f"{safe_title}.bin"
-                bin_file = os.path.join(root, bin_filename)
-                if os.path.exists(bin_file):
-                    print(f"Found complete .cue/.bin pair with full title: {cue_file}, {bin_file}")
-                    if os.access(cue_file, os.R_OK) and os.access(bin_file, os.R_OK):
-                        print(f"Game files {cue_file} and {bin_file} are readable")
-                    else:
-                        print(f"Game files {cue_file} or {bin_file} are not readable")
-                    return cue_file
-                else:
-                    print(f"Found .cue without .bin for full title: {cue_file}")
+    # Full title first, then the cleaned title; .chd is preferred over .cue/.bin for each
+    match_keys = [full_key]
+    if safe_cleaned_title != safe_title:
+        match_keys.append(fold_title(safe_cleaned_title))
     
-    # If full title fails, try cleaned title
-    cleaned_title = clean_game_title(title)
-    if cleaned_title != safe_title:
-        print(f"No files found with full title, trying cleaned title: {cleaned_title}")
-        # Sanitize cleaned title
-        safe_cleaned_title = re.sub(r'[<>:"/\\|?*]', '', cleaned_title).strip()
-        # Check for .chd in base paths and subfolders
-        game_filename = f"{safe_cleaned_title}.chd"
-        for base_path in paths:
-            for root, dirs, files in os.walk(base_path):
-                if game_filename in files:
-                    game_file = os.path.join(root, game_filename)
-                    print(f"Found .chd game file with cleaned title: {game_file}")
-                    if os.access(game_file, os.R_OK):
-                        print(f"Game file {game_file} is readable")
-                    else:
-                        print(f"Game file {game_file} is not readable")
-                    return game_file
-        
-        # Check for .cue and corresponding .bin in base paths and subfolders
-        game_filename = f"{safe_cleaned_title}.cue"
-        for base_path in paths:
-            for root, dirs, files in os.walk(base_path):
-                if game_filename in files:
-                    cue_file = os.path.join(root, game_filename)
-                    bin_filename = f"{safe_cleaned_title}.bin"
-                    bin_file = os.path.join(root, bin_filename)
-                    if os.path.exists(bin_file):
-                        print(f"Found complete .cue/.bin pair with cleaned title: {cue_file}, {bin_file}")
-                        if os.access(cue_file, os.R_OK) and os.access(bin_file, os.R_OK):
-                            print(f"Game files {cue_file} and {bin_file} are readable")
-                        else:
-                            print(f"Game files {cue_file} or {bin_file} are not readable")
-                        return cue_file
-                    else:
-                        print(f"Found .cue without .bin for cleaned title: {cue_file}")
+    if USE_LIBRARY_INDEX:
+        result = get_library(SYSTEM_GAME_PATHS).find(match_keys, system)
+    else:
+        result = resolve_game_file(match_keys, SYSTEM_GAME_PATHS[system])
+    if not result:
+        print(f"No complete .chd or .cue/.bin game files found for: {safe_title} or {safe_cleaned_title}")
+        return None
     
-    print(f"No complete .chd or .cue/.bin game files found for: {safe_title} or {cleaned_title}")
-    return None
\ No newline at end of file
+    game_file, kind, key_index = result
+    which = "full" if key_index == 0 else "cleaned"
+    if kind == "chd":
+        print(f"Found .chd game file with {which} title: {game_file}")
+    else:
+        print(f"Found complete .cue/.bin pair with {which} title: {game_file}")
+    if not os.access(game_file, os.R_OK):
+        print(f"Game file {game_file} is not readable")
+    return game_file
+
+def watch_game_library():
+    """Build or refresh the library index and keep it current with a background LibraryWatcher."""
+    return LibraryWatcher(get_library(SYSTEM_GAME_PATHS)).start()
+
+def scan_game_images():
+    """Start a background scan that reads the serial of every local image; returns the ContentIndex."""
+    library = get_library(SYSTEM_GAME_PATHS) if USE_LIBRARY_INDEX else None
+    return ContentIndex(SYSTEM_GAME_PATHS, library).start()
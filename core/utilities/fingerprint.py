@@ -0,0 +1,138 @@
+import os
+import json
+import time
+import fcntl
+import struct
+import hashlib
+import threading
+from core.utilities.identify import read_header
+from core.utilities.sectors import open_sectors
+
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../data/disc_cache.json")
+
+# Oldest entries are dropped beyond this many discs
+MAX_CACHE_ENTRIES = 500
+
+# ioctl and struct cdrom_tocentry from <linux/cdrom.h>
+CDROMREADTOCENTRY = 0x5306
+CDROM_LEADOUT = 0xAA
+CDROM_LBA = 0x01
+TOC_ENTRY = struct.Struct("BBBxiB3x")  # track, adr/ctrl, format, lba, datamode
+
+def log(message):
+    print(message)
+
+def read_leadout(f):
+    """Return the lead-out LBA from the disc TOC, or the sector count for image files, or None."""
+    try:
+        entry = bytearray(TOC_ENTRY.pack(CDROM_LEADOUT, 0, CDROM_LBA, 0, 0))
+        fcntl.ioctl(f.fileno(), CDROMREADTOCENTRY, entry)
+        return TOC_ENTRY.unpack(entry)[3]
+    except OSError:
+        return f.sector_count()
+
+def disc_fingerprint(header, leadout):
+    """Hash the identification header and the TOC lead-out into a cheap per-disc key."""
+    digest = hashlib.sha1(header)
+    digest.update(str(leadout).encode("ascii"))
+    return digest.hexdigest()
+
+def read_disc_fingerprint(drive_path):
+    """Read the header sectors and lead-out of a disc and return (fingerprint, header), or (None, None) on error."""
+    try:
+        with open_sectors(drive_path) as f:
+            header = read_header(f)
+            leadout = read_leadout(f)
+    except OSError as e:
+        log(f"Error fingerprinting disc in {drive_path}: {e}")
+        return None, None
+    if not header:
+        return None, None
+    return disc_fingerprint(header, leadout), header
+
+class DiscCache:
+    """Persistent fingerprint -> {system, serial, title, game_file} cache, including discs that were not recognised."""
+
+    def __init__(self, path=CACHE_PATH, max_entries=MAX_CACHE_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        # Drive workers update the cache from several threads
+        self.lock = threading.RLock()
+        self.entries = self.load()
+
+    def load(self):
+        try:
+            with open(self.path, "r") as f:
+                entries = json.load(f)
+            return entries if isinstance(entries, dict) else {}
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            log(f"Ignoring unreadable disc cache {self.path}: {e}")
+            return {}
+
+    def save(self):
+        with self.lock:
+            self._save()
+
+    def _save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temp_path = self.path + ".tmp"
+            with open(temp_path, "w") as f:
+                json.dump(self.entries, f, indent=1)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            log(f"Error saving disc cache {self.path}: {e}")
+
+    def get(self, fingerprint, catalog_mtime=0):
+        """Return the cached entry for a fingerprint, ignoring negative results older than the catalog."""
+        with self.lock:
+            entry = self.entries.get(fingerprint) if fingerprint else None
+        if entry is None:
+            return None
+        # A database update may know discs that used to be unmatched
+        if not entry.get("title") and entry.get("time", 0) < catalog_mtime:
+            return None
+        return entry
+
+    def record(self, fingerprint, system, serial, title=None, game_file=None):
+        """Store the result of identifying a disc; title None records a negative (unmatched) result."""
+        if not fingerprint:
+            return
+        with self.lock:
+            self.entries[fingerprint] = {
+                "system": system,
+                "serial": serial,
+                "title": title,
+                "game_file": game_file,
+                "time": time.time()
+            }
+            if len(self.entries) > self.max_entries:
+                oldest = sorted(self.entries, key=lambda key: self.entries[key].get("time", 0))
+                for key in oldest[:len(self.entries) - self.max_entries]:
+                    del self.entries[key]
+            self._save()
+
+    def get_game_file(self, fingerprint):
+        with self.lock:
+            return (self.entries.get(fingerprint) or {}).get("game_file")
+
+    def set_game_file(self, fingerprint, game_file):
+        with self.lock:
+            entry = self.entries.get(fingerprint)
+            if entry is not None and entry.get("game_file") != game_file:
+                entry["game_file"] = game_file
+                self._save()
+
+def cached_game_finder(cache, fingerprint, find_game_file):
+    """Wrap find_game_file so a cached local file is reused and newly found files are stored for the disc."""
+    def find(title, system):
+        game_file = cache.get_game_file(fingerprint)
+        if game_file and os.path.exists(game_file):
+            print(f"Using cached game file: {game_file}")
+            return game_file
+        game_file = find_game_file(title, system)
+        cache.set_game_file(fingerprint, game_file)
+        return game_file
+    return find
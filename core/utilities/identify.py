@@ -0,0 +1,74 @@
+from core.utilities.iso9660 import IsoReader, IsoError, SECTOR_SIZE, PVD_SECTOR, parse_primary_volume_descriptor
+from core.utilities.disc import parse_saturn_header, parse_mcd_header, parse_psx_volume
+from core.utilities.sectors import open_sectors
+
+# Sectors 0-16 cover the Sega boot headers in sector 0 and the ISO9660 primary volume descriptor
+HEADER_SECTORS = PVD_SECTOR + 1
+
+# Registered identifiers, checked in order: (system, matches(header), parse(header, f) -> serial)
+IDENTIFIERS = []
+
+def log(message):
+    print(message)
+
+def register_identifier(system, matches, parse):
+    """Register a system whose discs are recognised by matches(header) and read by parse(header, f)."""
+    IDENTIFIERS.append((system, matches, parse))
+
+def read_header(f):
+    """Read the shared identification buffer (the first HEADER_SECTORS sectors) from a disc or image."""
+    f.seek(0)
+    return f.read(HEADER_SECTORS * SECTOR_SIZE)
+
+def header_pvd(header):
+    """Return the parsed primary volume descriptor from the header buffer, or None if there is none."""
+    data = header[PVD_SECTOR * SECTOR_SIZE:HEADER_SECTORS * SECTOR_SIZE]
+    if len(data) < SECTOR_SIZE:
+        return None
+    try:
+        return parse_primary_volume_descriptor(data)
+    except IsoError:
+        return None
+
+def is_saturn_header(header):
+    return header[:15] == b"SEGA SEGASATURN"
+
+def is_mcd_header(header):
+    return header[:14] == b"SEGADISCSYSTEM"
+
+def is_psx_header(header):
+    pvd = header_pvd(header)
+    return pvd is not None and pvd["system_id"] == "PLAYSTATION"
+
+def parse_saturn(header, f):
+    return parse_saturn_header(header[:SECTOR_SIZE])
+
+def parse_mcd(header, f):
+    return parse_mcd_header(header[:SECTOR_SIZE])
+
+def parse_psx(header, f):
+    # The PVD is already in the buffer, so only the root directory and SYSTEM.CNF are read from the disc
+    game_serial, _ = parse_psx_volume(IsoReader(f, pvd=header_pvd(header)))
+    return game_serial
+
+register_identifier("saturn", is_saturn_header, parse_saturn)
+register_identifier("megacd", is_mcd_header, parse_mcd)
+register_identifier("psx", is_psx_header, parse_psx)
+
+def identify_header(header, f):
+    """Dispatch the header buffer to the first matching identifier and return (system, serial) or (None, None)."""
+    for system, matches, parse in IDENTIFIERS:
+        if matches(header):
+            log(f"Disc signature matches {system}")
+            return system, parse(header, f)
+    log("No known system signature found on disc.")
+    return None, None
+
+def identify_disc(drive_path, header=None):
+    """Read the disc header once (unless already read) and return (system, serial), or (None, None) if not recognised.
+
+    drive_path may be a device, an .iso, a raw MODE1/MODE2 .bin or a .cue sheet. Read errors raise OSError
+    or IsoError instead, so callers can retry them rather than treat the disc as unrecognised.
+    """
+    with open_sectors(drive_path) as f:
+        return identify_header(header or read_header(f), f)
@@ -0,0 +1,139 @@
+import struct
+
+SECTOR_SIZE = 2048
+PVD_SECTOR = 16
+
+# Volume descriptor types (ECMA-119 8.1.1)
+VD_PRIMARY = 1
+VD_TERMINATOR = 255
+VD_IDENTIFIER = b"CD001"
+
+# Directory record file flags
+FLAG_DIRECTORY = 0x02
+
+# Largest directory/file read, so a corrupt length cannot make us read the whole disc
+MAX_READ_SIZE = 1024 * 1024
+
+class IsoError(Exception):
+    """Raised when a disc or image does not contain a readable ISO9660 filesystem."""
+
+def read_sector(f, lba, count=1):
+    """Read count 2048-byte logical sectors starting at lba from a cooked device or .iso image."""
+    f.seek(lba * SECTOR_SIZE)
+    data = f.read(count * SECTOR_SIZE)
+    if len(data) < count * SECTOR_SIZE:
+        raise IsoError(f"Short read at sector {lba}")
+    return data
+
+def parse_directory_record(data, offset=0):
+    """Parse the directory record at offset and return it as a dict, or None for zero padding."""
+    length = data[offset]
+    if length == 0:
+        return None
+    if length < 34 or offset + length > len(data):
+        raise IsoError(f"Invalid directory record length {length}")
+    name_length = data[offset + 32]
+    raw_name = bytes(data[offset + 33:offset + 33 + name_length])
+    if raw_name == b"\x00":
+        name = "."
+    elif raw_name == b"\x01":
+        name = ".."
+    else:
+        # Drop the ";1" version suffix and the trailing dot of extensionless names
+        name = raw_name.decode("ascii", errors="ignore").split(";")[0].rstrip(".")
+    return {
+        "name": name,
+        "lba": struct.unpack_from("<I", data, offset + 2)[0],
+        "size": struct.unpack_from("<I", data, offset + 10)[0],
+        "is_dir": bool(data[offset + 25] & FLAG_DIRECTORY),
+        "length": length
+    }
+
+def parse_primary_volume_descriptor(data):
+    """Parse a 2048-byte Primary Volume Descriptor into system id, volume id, block size and root record."""
+    if data[0] != VD_PRIMARY or data[1:6] != VD_IDENTIFIER:
+        raise IsoError("No ISO9660 primary volume descriptor")
+    block_size = struct.unpack_from("<H", data, 128)[0]
+    if block_size != SECTOR_SIZE:
+        raise IsoError(f"Unsupported logical block size {block_size}")
+    return {
+        "system_id": data[8:40].decode("ascii", errors="ignore").strip(),
+        "volume_id": data[40:72].decode("ascii", errors="ignore").strip(),
+        "volume_space_size": struct.unpack_from("<I", data, 80)[0],
+        "root": parse_directory_record(data, 156)
+    }
+
+def parse_directory(data):
+    """Return the records in a directory extent, skipping . and .. and the padding at sector ends."""
+    records = []
+    offset = 0
+    while offset < len(data):
+        record = parse_directory_record(data, offset)
+        if record is None:
+            # Records never span sectors; a zero length byte means continue at the next sector
+            offset = (offset // SECTOR_SIZE + 1) * SECTOR_SIZE
+            continue
+        if record["name"] not in (".", ".."):
+            records.append(record)
+        offset += record["length"]
+    return records
+
+class IsoReader:
+    """Reads files from an ISO9660 filesystem directly from a block device or image, without mounting it."""
+
+    def __init__(self, f, read_sector=read_sector, pvd=None):
+        self.f = f
+        self.read_sector = read_sector
+        # Callers that already read sector 16 can pass the parsed descriptor to skip re-reading it
+        self.pvd = pvd or self._find_primary_volume_descriptor()
+
+    def _find_primary_volume_descriptor(self):
+        lba = PVD_SECTOR
+        # The descriptor set is short; stop at the terminator or after a few sectors
+        while lba < PVD_SECTOR + 16:
+            data = self.read_sector(self.f, lba)
+            if data[1:6] != VD_IDENTIFIER or data[0] == VD_TERMINATOR:
+                break
+            if data[0] == VD_PRIMARY:
+                return parse_primary_volume_descriptor(data)
+            lba += 1
+        raise IsoError("No ISO9660 primary volume descriptor")
+
+    @property
+    def volume_id(self):
+        return self.pvd["volume_id"]
+
+    @property
+    def system_id(self):
+        return self.pvd["system_id"]
+
+    def read_extent(self, record):
+        """Return the data of a file or directory record."""
+        size = min(record["size"], MAX_READ_SIZE)
+        sectors = (size + SECTOR_SIZE - 1) // SECTOR_SIZE
+        if sectors == 0:
+            return b""
+        return self.read_sector(self.f, record["lba"], sectors)[:size]
+
+    def list_directory(self, record=None):
+        """Return the records of a directory, the root directory by default."""
+        return parse_directory(self.read_extent(record or self.pvd["root"]))
+
+    def find(self, path):
+        """Return the record for a slash-separated path (case-insensitive), or None if it does not exist."""
+        record = self.pvd["root"]
+        for part in [p for p in path.replace("\\", "/").split("/") if p]:
+            if not record["is_dir"]:
+                return None
+            matches = [r for r in self.list_directory(record) if r["name"].upper() == part.upper()]
+            if not matches:
+                return None
+            record = matches[0]
+        return record
+
+    def read_file(self, path):
+        """Return the contents of the file at path, or None if it does not exist."""
+        record = self.find(path)
+        if record is None or record["is_dir"]:
+            return None
+        return self.read_extent(record)
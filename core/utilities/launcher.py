@@ -4,6 +4,7 @@ import xml.etree.ElementTree as ET
 
 # Import the new Python save_disc function
 from core.utilities.save import save_disc  # <-- NEW: Python save_disc
+from core.utilities.titles import sanitize_title
 
 MISTER_CMD = "/dev/MiSTer_cmd"
 TMP_MGL_PATH = "/tmp/game.mgl"
@@ -39,7 +40,7 @@ def launch_game_on_mister(game_serial, title, core_path, system, drive_path, fin
         print(f"Using generic title for unknown game: {title}")
 
     # Sanitize title for command-line safety
-    title = title.replace('<', '').replace('>', '').replace(':', '').replace('"', '').replace('/', '').replace('\\', '').replace('|', '').replace('?', '').replace('*', '').strip()
+    title = sanitize_title(title)
     if not title:
         title = "Unknown_Game"
 
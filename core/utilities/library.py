@@ -0,0 +1,467 @@
+import os
+import json
+import time
+import select
+import threading
+from core.utilities.inotify import (Inotify, IN_CREATE, IN_DELETE, IN_MOVED_FROM, IN_MOVED_TO, IN_CLOSE_WRITE,
+                                    IN_DELETE_SELF, IN_MOVE_SELF, IN_Q_OVERFLOW, IN_IGNORED, IN_ONLYDIR, IN_ISDIR)
+from core.utilities.titles import fold_title
+
+LIBRARY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../data/library.json")
+LIBRARY_VERSION = 1
+
+GAME_EXTENSIONS = (".chd", ".cue", ".bin")
+
+# FAT/exFAT store directory mtimes with 2 second resolution; a directory modified this close to a scan
+# is rescanned next time because a later change could leave its mtime unchanged
+MTIME_GRANULARITY = 2
+
+# Events that change which game files or subdirectories a directory contains
+WATCH_MASK = (IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_CLOSE_WRITE |
+              IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+
+# Seconds between checks for roots that appear later (USB drives); without inotify, or with directories
+# it could not watch, each check is a full mtime-diff refresh instead
+LIBRARY_POLL_INTERVAL = 60
+
+# inotify changes are written to library.json at most this often (seconds), so a batch of copies is one write
+LIBRARY_SAVE_DELAY = 10
+
+_library = None
+_library_lock = threading.Lock()
+
+def log(message):
+    print(message)
+
+def title_key(title):
+    """Lookup key for a game title or file stem, the same folded key stored in the games table."""
+    return fold_title(title)
+
+def scan_directory(path):
+    """List one directory and return (subdirectory paths, game file names) in a single scandir pass."""
+    subdirs = []
+    files = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            try:
+                if entry.is_dir():
+                    subdirs.append(entry.path)
+                elif entry.name.lower().endswith(GAME_EXTENSIONS):
+                    files.append(entry.name)
+            except OSError:
+                continue
+    return sorted(subdirs), sorted(files)
+
+def directory_entries(directory, files):
+    """Return the .chd files and complete .cue/.bin pairs of one directory as key -> [(kind, path)]."""
+    bins = {title_key(os.path.splitext(name)[0]) for name in files if name.lower().endswith(".bin")}
+    entries = {}
+    for name in files:
+        stem, ext = os.path.splitext(name)
+        ext = ext.lower()
+        if ext == ".chd":
+            kind = "chd"
+        elif ext == ".cue" and title_key(stem) in bins:
+            kind = "cue"
+        else:
+            continue
+        entries.setdefault(title_key(stem), []).append((kind, os.path.join(directory, name)))
+    return entries
+
+def index_directory(directory, files, titles):
+    """Add the .chd files and complete .cue/.bin pairs of one directory to a key -> {"chd", "cue"} map."""
+    for key, found in directory_entries(directory, files).items():
+        entry = titles.setdefault(key, {})
+        # Earlier roots and directories win, as with the previous os.walk search order
+        for kind, path in found:
+            entry.setdefault(kind, path)
+
+def file_keys(files):
+    """Return the title keys of a directory's game files."""
+    return {title_key(os.path.splitext(name)[0]) for name in files}
+
+class GameLibrary:
+    """Persistent index of local game files per system, refreshed by rescanning only directories whose mtime changed."""
+
+    def __init__(self, roots, path=LIBRARY_PATH):
+        self.roots = roots
+        self.path = path
+        self.lock = threading.RLock()
+        self.dirs = {}    # directory -> {"system", "mtime", "subdirs", "files"}
+        self.titles = {}  # system -> title key -> {"chd": path, "cue": path}
+        self.key_dirs = {}  # system -> title key -> set of directories with a file of that key
+        # directory -> (system, files) as of the last title update, for directories changed since
+        self.changed = {}
+        # Set while a LibraryWatcher keeps the index current, so lookups no longer refresh on a miss
+        self.live = False
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            log(f"Ignoring unreadable library index {self.path}: {e}")
+            return
+        if data.get("version") == LIBRARY_VERSION and data.get("roots") == self.roots:
+            self.dirs = data.get("dirs", {})
+            self.rebuild_titles()
+
+    def save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temp_path = self.path + ".tmp"
+            with open(temp_path, "w") as f:
+                json.dump({"version": LIBRARY_VERSION, "roots": self.roots, "dirs": self.dirs}, f)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            log(f"Error saving library index {self.path}: {e}")
+
+    def directory_rank(self, directory, system):
+        """Sort key giving earlier roots, then directories in walk order, precedence for the same title."""
+        roots = self.roots.get(system, [])
+        for i, root in enumerate(roots):
+            root = os.path.normpath(root)
+            if directory == root or directory.startswith(root + os.sep):
+                return i, directory.split(os.sep)
+        return len(roots), directory.split(os.sep)
+
+    def rebuild_titles(self):
+        titles = {system: {} for system in self.roots}
+        key_dirs = {}
+        ordered = sorted(self.dirs.items(), key=lambda item: self.directory_rank(item[0], item[1]["system"]))
+        for directory, info in ordered:
+            index_directory(directory, info["files"], titles.setdefault(info["system"], {}))
+            system_keys = key_dirs.setdefault(info["system"], {})
+            for key in file_keys(info["files"]):
+                system_keys.setdefault(key, set()).add(directory)
+        self.titles = titles
+        self.key_dirs = key_dirs
+        self.changed = {}
+
+    def mark_changed(self, directory):
+        """Remember a directory's files before its first change since the last title update."""
+        if directory not in self.changed:
+            info = self.dirs.get(directory)
+            self.changed[directory] = (info["system"], info["files"]) if info else None
+
+    def update_titles(self):
+        """Re-index only the title keys of files in directories changed since the last update."""
+        with self.lock:
+            affected = {}  # system -> keys
+            for directory, old in self.changed.items():
+                new = self.dirs.get(directory)
+                for state, present in ((old, False), (new and (new["system"], new["files"]), True)):
+                    if not state:
+                        continue
+                    system, files = state
+                    system_keys = self.key_dirs.setdefault(system, {})
+                    for key in file_keys(files):
+                        affected.setdefault(system, set()).add(key)
+                        directories = system_keys.setdefault(key, set())
+                        if present:
+                            directories.add(directory)
+                        else:
+                            directories.discard(directory)
+            for system, keys in affected.items():
+                titles = self.titles.setdefault(system, {})
+                for key in keys:
+                    directories = self.key_dirs[system].get(key)
+                    entry = {}
+                    for directory in sorted(directories or (), key=lambda d: self.directory_rank(d, system)):
+                        for kind, path in directory_entries(directory, self.dirs[directory]["files"]).get(key, []):
+                            entry.setdefault(kind, path)
+                    if entry:
+                        titles[key] = entry
+                    else:
+                        titles.pop(key, None)
+                    if not directories:
+                        self.key_dirs[system].pop(key, None)
+            self.changed = {}
+            return bool(affected)
+
+    def refresh(self, systems=None):
+        """Walk the game roots, listing only new or changed directories, and return the number rescanned."""
+        with self.lock:
+            systems = systems or list(self.roots)
+            seen = set()
+            rescanned = 0
+            now = time.time()
+            for system in systems:
+                stack = list(reversed(self.roots.get(system, [])))
+                while stack:
+                    directory = os.path.normpath(stack.pop())
+                    if directory in seen:
+                        continue
+                    try:
+                        mtime = os.stat(directory).st_mtime
+                    except OSError:
+                        continue
+                    seen.add(directory)
+                    cached = self.dirs.get(directory)
+                    if not cached or cached["mtime"] != mtime or cached["system"] != system:
+                        try:
+                            subdirs, files = scan_directory(directory)
+                        except OSError as e:
+                            log(f"Error scanning {directory}: {e}")
+                            continue
+                        rescanned += 1
+                        cached = {
+                            "system": system,
+                            "mtime": mtime if now - mtime > MTIME_GRANULARITY else None,
+                            "subdirs": subdirs,
+                            "files": files
+                        }
+                        self.dirs[directory] = cached
+                    stack.extend(reversed(cached["subdirs"]))
+            removed = [d for d, info in self.dirs.items() if info["system"] in systems and d not in seen]
+            for directory in removed:
+                del self.dirs[directory]
+            if rescanned or removed:
+                self.rebuild_titles()
+                self.save()
+                log(f"Library refreshed: {len(seen)} directories, {rescanned} rescanned, {len(removed)} removed")
+            return rescanned
+
+    def add_tree(self, directory, system):
+        """Index a new directory and everything below it; return the directories added."""
+        with self.lock:
+            added = []
+            stack = [os.path.normpath(directory)]
+            while stack:
+                path = stack.pop()
+                try:
+                    mtime = os.stat(path).st_mtime
+                    subdirs, files = scan_directory(path)
+                except OSError:
+                    continue
+                if time.time() - mtime <= MTIME_GRANULARITY:
+                    mtime = None
+                self.mark_changed(path)
+                self.dirs[path] = {"system": system, "mtime": mtime, "subdirs": subdirs, "files": files}
+                added.append(path)
+                stack.extend(subdirs)
+            return added
+
+    def remove_tree(self, directory):
+        """Drop a directory and everything below it from the index; return the directories removed."""
+        with self.lock:
+            directory = os.path.normpath(directory)
+            prefix = directory + os.sep
+            removed = [d for d in self.dirs if d == directory or d.startswith(prefix)]
+            for path in removed:
+                self.mark_changed(path)
+                del self.dirs[path]
+            return removed
+
+    def apply_event(self, directory, name, is_dir, present):
+        """Apply one created/deleted/renamed entry in a watched directory; return directories added."""
+        with self.lock:
+            info = self.dirs.get(directory)
+            if info is None:
+                return []
+            path = os.path.join(directory, name)
+            added = []
+            if is_dir:
+                if present:
+                    if path not in info["subdirs"]:
+                        info["subdirs"] = sorted(info["subdirs"] + [path])
+                    added = self.add_tree(path, info["system"])
+                else:
+                    info["subdirs"] = [d for d in info["subdirs"] if d != path]
+                    self.remove_tree(path)
+            elif name.lower().endswith(GAME_EXTENSIONS):
+                self.mark_changed(directory)
+                files = set(info["files"])
+                if present:
+                    files.add(name)
+                else:
+                    files.discard(name)
+                info["files"] = sorted(files)
+            # Keep the stored mtime current so the periodic refresh does not rescan this directory
+            try:
+                mtime = os.stat(directory).st_mtime
+                info["mtime"] = mtime if time.time() - mtime > MTIME_GRANULARITY else None
+            except OSError:
+                pass
+            return added
+
+    def lookup(self, key, system):
+        """Return the {"chd", "cue"} entry for a folded title key, or None, from the in-memory index."""
+        return self.titles.get(system, {}).get(key)
+
+    def find(self, keys, system):
+        """Return (path, format, key index) for the first of keys with a local file, preferring .chd, else None.
+
+        keys are folded title keys (see title_key), tried in order with .chd before .cue/.bin for each.
+        A miss or a vanished file triggers one incremental refresh before giving up.
+        """
+        with self.lock:
+            for attempt in range(2):
+                for i, key in enumerate(keys):
+                    entry = self.lookup(key, system) or {}
+                    for kind in ("chd", "cue"):
+                        path = entry.get(kind)
+                        if path and os.path.exists(path):
+                            return path, kind, i
+                if attempt == 0 and not self.live:
+                    self.refresh([system])
+            return None
+
+def get_library(roots):
+    """Return the shared GameLibrary for roots, loading and refreshing it on first use."""
+    global _library
+    with _library_lock:
+        if _library is None or _library.roots != roots:
+            _library = GameLibrary(roots)
+            _library.refresh()
+        return _library
+
+class LibraryWatcher:
+    """Keeps a GameLibrary current from inotify events on every indexed directory, with periodic mtime diffing."""
+
+    def __init__(self, library, poll_interval=LIBRARY_POLL_INTERVAL, save_delay=LIBRARY_SAVE_DELAY):
+        self.library = library
+        self.poll_interval = poll_interval
+        self.save_delay = save_delay
+        self.watches = {}  # wd -> directory
+        self.watched = {}  # directory -> wd
+        self.unwatched = set()  # indexed directories inotify could not watch
+        self.save_due = None  # monotonic time of the pending library.json write
+        self.last_check = time.monotonic()
+        self.stopped = threading.Event()
+        self.thread = None
+        try:
+            self.inotify = Inotify()
+        except OSError as e:
+            log(f"inotify unavailable for the game library, polling every {poll_interval}s: {e}")
+            self.inotify = None
+
+    def sync_watches(self):
+        """Watch every indexed directory and drop watches for directories that left the index."""
+        if self.inotify is None:
+            return
+        directories = set(self.library.dirs)
+        self.unwatched &= directories
+        for directory in [d for d in self.watched if d not in directories]:
+            wd = self.watched.pop(directory)
+            self.watches.pop(wd, None)
+            self.inotify.remove_watch(wd)
+        for directory in directories:
+            if directory in self.watched:
+                continue
+            try:
+                wd = self.inotify.add_watch(directory, WATCH_MASK)
+            except OSError as e:
+                # Usually fs.inotify.max_user_watches; the periodic refresh still covers this directory
+                if directory not in self.unwatched:
+                    log(f"Cannot watch {directory}: {e}")
+                    self.unwatched.add(directory)
+                continue
+            self.unwatched.discard(directory)
+            self.watches[wd] = directory
+            self.watched[directory] = wd
+
+    def check_roots(self):
+        """Refresh the systems with a game root that exists but is not indexed yet; return True if any."""
+        systems = []
+        for system, roots in self.library.roots.items():
+            for root in roots:
+                root = os.path.normpath(root)
+                if root not in self.library.dirs and os.path.isdir(root):
+                    systems.append(system)
+                    break
+        return bool(systems) and self.library.refresh(systems) > 0
+
+    def process_events(self):
+        """Apply pending inotify events to the library and its title map; return True if files changed.
+
+        Only the title keys of files in the affected directories are re-indexed; the caller saves later.
+        """
+        changed = False
+        for wd, mask, cookie, name in self.inotify.read_events():
+            if mask & IN_Q_OVERFLOW:
+                log("Library watch queue overflowed, refreshing index")
+                self.library.refresh()
+                break
+            directory = self.watches.get(wd)
+            if directory is None:
+                continue
+            if mask & IN_IGNORED:
+                self.watches.pop(wd, None)
+                self.watched.pop(directory, None)
+                continue
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                self.library.remove_tree(directory)
+                changed = True
+                continue
+            if not name:
+                continue
+            present = bool(mask & (IN_CREATE | IN_MOVED_TO | IN_CLOSE_WRITE))
+            self.library.apply_event(directory, name, bool(mask & IN_ISDIR), present)
+            changed = True
+        if changed:
+            self.library.update_titles()
+        return changed
+
+    def flush(self):
+        """Write library.json now if inotify changes are waiting for their delayed save."""
+        with self.library.lock:
+            if self.save_due is not None:
+                self.save_due = None
+                self.library.save()
+
+    def poll_once(self, timeout):
+        """Wait up to timeout for events, saving their changes after save_delay.
+
+        Every poll_interval, newly mounted roots are indexed; the full mtime-diff refresh only runs without
+        inotify or while some directory could not be watched.
+        """
+        now = time.monotonic()
+        if self.save_due is not None:
+            timeout = max(min(timeout, self.save_due - now), 0)
+        timeout = max(min(timeout, self.last_check + self.poll_interval - now), 0)
+        readable = []
+        if self.inotify is not None:
+            readable, _, _ = select.select([self.inotify], [], [], timeout)
+        else:
+            self.stopped.wait(timeout)
+        with self.library.lock:
+            if readable and self.process_events() and self.save_due is None:
+                self.save_due = time.monotonic() + self.save_delay
+            now = time.monotonic()
+            if now - self.last_check >= self.poll_interval:
+                self.last_check = now
+                if self.inotify is None or self.unwatched:
+                    self.library.refresh()
+                else:
+                    self.check_roots()
+            if self.save_due is not None and now >= self.save_due:
+                self.flush()
+            self.sync_watches()
+
+    def run(self):
+        while not self.stopped.is_set():
+            try:
+                self.poll_once(self.poll_interval)
+            except Exception as e:
+                log(f"Library watcher error: {e}")
+                self.stopped.wait(self.poll_interval)
+
+    def start(self):
+        """Start watching in a daemon thread; lookups stop refreshing on a miss while it runs."""
+        with self.library.lock:
+            self.sync_watches()
+            self.library.live = True
+        self.thread = threading.Thread(target=self.run, name="library-watcher", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        self.flush()
+        self.library.live = False
+        if self.inotify is not None:
+            self.inotify.close()
@@ -0,0 +1,152 @@
+import os
+import fcntl
+
+# ioctl requests and results from <linux/cdrom.h>
+CDROM_MEDIA_CHANGED = 0x5325
+CDROM_DRIVE_STATUS = 0x5326
+CDSL_CURRENT = 0x7FFFFFFF
+
+CDS_NO_INFO = 0
+CDS_NO_DISC = 1
+CDS_TRAY_OPEN = 2
+CDS_DRIVE_NOT_READY = 3
+CDS_DISC_OK = 4
+
+STATUS_NAMES = {
+    CDS_NO_INFO: "no info",
+    CDS_NO_DISC: "no disc",
+    CDS_TRAY_OPEN: "tray open",
+    CDS_DRIVE_NOT_READY: "spinning up",
+    CDS_DISC_OK: "disc ok"
+}
+
+def log(message):
+    print(message)
+
+class IoctlMediaBackend:
+    """Reads drive status and the media-changed flag with CDROM ioctls, keeping one non-blocking fd per drive."""
+
+    def __init__(self):
+        self.fds = {}
+
+    def _fd(self, drive_path):
+        fd = self.fds.get(drive_path)
+        if fd is None:
+            # O_NONBLOCK lets the open succeed with no disc and without closing the tray
+            fd = os.open(drive_path, os.O_RDONLY | os.O_NONBLOCK)
+            self.fds[drive_path] = fd
+        return fd
+
+    def drive_status(self, drive_path):
+        """Return the CDS_* drive status, or None if the device does not support CDROM ioctls."""
+        try:
+            return fcntl.ioctl(self._fd(drive_path), CDROM_DRIVE_STATUS, CDSL_CURRENT)
+        except OSError as e:
+            self.forget(drive_path)
+            log(f"CDROM_DRIVE_STATUS unavailable for {drive_path}: {e}")
+            return None
+
+    def media_changed(self, drive_path):
+        """Return True if the media changed since the last call (the kernel clears the flag on read)."""
+        try:
+            return fcntl.ioctl(self._fd(drive_path), CDROM_MEDIA_CHANGED, CDSL_CURRENT) == 1
+        except OSError:
+            self.forget(drive_path)
+            return False
+
+    def forget(self, drive_path):
+        """Close the cached fd for a drive (e.g. after it was unplugged)."""
+        fd = self.fds.pop(drive_path, None)
+        if fd is not None:
+            os.close(fd)
+
+    def close(self):
+        for drive_path in list(self.fds):
+            self.forget(drive_path)
+
+class ReadProbeMediaBackend:
+    """Fallback for devices without CDROM ioctls: a disc is present if one byte can be read."""
+
+    def drive_status(self, drive_path):
+        try:
+            with open(drive_path, "rb") as f:
+                f.read(1)
+            return CDS_DISC_OK
+        except OSError:
+            return CDS_NO_DISC
+
+    def media_changed(self, drive_path):
+        return False
+
+    def forget(self, drive_path):
+        pass
+
+    def close(self):
+        pass
+
+class ScriptedMediaBackend:
+    """Test backend that replays a scripted list of (status, media changed) results per drive, repeating the last."""
+
+    def __init__(self, script):
+        self.script = {drive_path: list(steps) for drive_path, steps in script.items()}
+        self.current = {}
+
+    def _advance(self, drive_path):
+        steps = self.script.get(drive_path)
+        if steps:
+            self.current[drive_path] = steps.pop(0)
+        return self.current.get(drive_path, (CDS_NO_INFO, False))
+
+    def drive_status(self, drive_path):
+        return self._advance(drive_path)[0]
+
+    def media_changed(self, drive_path):
+        return self.current.get(drive_path, (CDS_NO_INFO, False))[1]
+
+    def forget(self, drive_path):
+        pass
+
+    def close(self):
+        pass
+
+class MediaMonitor:
+    """Tracks per-drive media status and reports when a newly inserted or changed disc needs identifying."""
+
+    def __init__(self, backend=None):
+        self.backend = backend or IoctlMediaBackend()
+        self.fallback = ReadProbeMediaBackend()
+        self.unsupported = set()
+        self.last_status = {}
+
+    def poll(self, drive_path):
+        """Return (CDS_* status, changed) where changed means the disc should be (re)identified."""
+        backend = self.fallback if drive_path in self.unsupported else self.backend
+        status = backend.drive_status(drive_path)
+        if status is None:
+            self.unsupported.add(drive_path)
+            backend = self.fallback
+            status = backend.drive_status(drive_path)
+        # Read the flag on every poll so it only reports changes since the previous one
+        flag = backend.media_changed(drive_path)
+        previous = self.last_status.get(drive_path)
+        self.last_status[drive_path] = status
+        if previous != status:
+            log(f"Drive {drive_path}: {STATUS_NAMES.get(status, status)}")
+        changed = status == CDS_DISC_OK and (flag or previous != CDS_DISC_OK)
+        return status, changed
+
+    def forget(self, drive_path):
+        self.backend.forget(drive_path)
+        self.unsupported.discard(drive_path)
+        self.last_status.pop(drive_path, None)
+
+    def close(self):
+        self.backend.close()
+
+def get_drive_status(drive_path):
+    """One-shot CDS_* status for a drive, or None if it does not support CDROM ioctls."""
+    backend = IoctlMediaBackend()
+    try:
+        return backend.drive_status(drive_path)
+    finally:
+        backend.close()
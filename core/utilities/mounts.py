@@ -0,0 +1,120 @@
+import os
+import re
+import select
+
+MOUNTINFO_PATH = "/proc/self/mountinfo"
+MOUNTS_PATH = "/proc/self/mounts"
+
+# Space, tab, newline and backslash are written as octal escapes (\040 etc.) in mount tables
+OCTAL_ESCAPE_RE = re.compile(r"\\([0-7]{3})")
+
+_mount_table = None
+
+def log(message):
+    print(message)
+
+def unescape_mount_field(field):
+    return OCTAL_ESCAPE_RE.sub(lambda m: chr(int(m.group(1), 8)), field)
+
+def parse_mountinfo(text):
+    """Parse /proc/self/mountinfo text into a list of mount dicts (see proc(5) for the field layout)."""
+    mounts = []
+    for line in text.splitlines():
+        fields = line.split()
+        # Optional fields run until the "-" separator, followed by fstype, source and super options
+        try:
+            separator = fields.index("-", 6)
+        except ValueError:
+            continue
+        if len(fields) < separator + 3:
+            continue
+        mounts.append({
+            "mount_id": int(fields[0]),
+            "parent_id": int(fields[1]),
+            "device": fields[2],
+            "root": unescape_mount_field(fields[3]),
+            "mount_point": unescape_mount_field(fields[4]),
+            "options": fields[5],
+            "fstype": fields[separator + 1],
+            "source": unescape_mount_field(fields[separator + 2]),
+            "super_options": fields[separator + 3] if len(fields) > separator + 3 else ""
+        })
+    return mounts
+
+def read_mountinfo(path=MOUNTINFO_PATH):
+    """Return the current mounts of this process's mount namespace."""
+    with open(path, "r") as f:
+        return parse_mountinfo(f.read())
+
+def same_device(source, drive_path):
+    return source == drive_path or os.path.realpath(source) == os.path.realpath(drive_path)
+
+class MountTable:
+    """Cached view of mountinfo that is re-read only after poll() on /proc/self/mounts reports a change."""
+
+    def __init__(self, mountinfo_path=MOUNTINFO_PATH, mounts_path=MOUNTS_PATH):
+        self.mountinfo_path = mountinfo_path
+        self.mounts = None
+        self.poller = None
+        try:
+            # The kernel flags POLLPRI|POLLERR on this fd whenever the mount namespace changes
+            self.mounts_file = open(mounts_path, "r")
+            self.poller = select.poll()
+            self.poller.register(self.mounts_file, select.POLLPRI | select.POLLERR)
+        except OSError as e:
+            log(f"Cannot watch {mounts_path} for changes, mount table will not be cached: {e}")
+            self.mounts_file = None
+
+    def changed(self):
+        """Return True if the mount table may have changed since the last call."""
+        if self.poller is None:
+            return True
+        return bool(self.poller.poll(0))
+
+    def entries(self):
+        """Return the mount list, re-reading mountinfo only when it changed."""
+        if self.mounts is None or self.changed():
+            self.mounts = read_mountinfo(self.mountinfo_path)
+        return self.mounts
+
+    def is_mounted(self, drive_path, mount_point=None):
+        """Return True if drive_path is mounted (at mount_point, if given)."""
+        for mount in self.entries():
+            if same_device(mount["source"], drive_path) and (
+                    mount_point is None or os.path.normpath(mount["mount_point"]) == os.path.normpath(mount_point)):
+                return True
+        return False
+
+    def is_mount_point(self, mount_point):
+        """Return True if anything is mounted at mount_point."""
+        mount_point = os.path.normpath(mount_point)
+        return any(os.path.normpath(mount["mount_point"]) == mount_point for mount in self.entries())
+
+    def close(self):
+        if self.mounts_file is not None:
+            self.mounts_file.close()
+            self.mounts_file = None
+            self.poller = None
+
+def get_mount_table():
+    """Return the shared MountTable, creating it on first use."""
+    global _mount_table
+    if _mount_table is None:
+        _mount_table = MountTable()
+    return _mount_table
+
+def is_mounted(drive_path, mount_point=None):
+    """Check the mount table for drive_path (at mount_point, if given) without running mount."""
+    try:
+        return get_mount_table().is_mounted(drive_path, mount_point)
+    except OSError as e:
+        log(f"Error reading mount table: {e}")
+        return False
+
+def is_mount_point(mount_point):
+    """Check whether anything is mounted at mount_point without running mount."""
+    try:
+        return get_mount_table().is_mount_point(mount_point)
+    except OSError as e:
+        log(f"Error reading mount table: {e}")
+        return False
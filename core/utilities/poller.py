@@ -0,0 +1,64 @@
+from core.utilities.media import CDS_TRAY_OPEN, CDS_DRIVE_NOT_READY, CDS_DISC_OK
+
+EMPTY = "empty"
+SPINNING_UP = "spinning-up"
+IDENTIFIED = "identified"
+GAME_RUNNING = "game-running"
+
+# state -> (first poll interval, backoff ceiling) in seconds
+POLL_INTERVALS = {
+    EMPTY: (1, 8),
+    SPINNING_UP: (0.25, 1),
+    IDENTIFIED: (1, 5),
+    GAME_RUNNING: (2, 10)
+}
+BACKOFF_FACTOR = 2
+
+# Fast polls right after the tray closes, so a new disc is picked up as soon as it spins up
+BURST_INTERVAL = 0.2
+BURST_POLLS = 10
+
+def state_for_status(status):
+    """Map a CDS_* drive status to the poller state for a disc that has not been identified yet."""
+    if status == CDS_DRIVE_NOT_READY:
+        return SPINNING_UP
+    if status == CDS_DISC_OK:
+        return IDENTIFIED
+    return EMPTY
+
+class AdaptivePoller:
+    """Service loop state machine that hands out per-state poll intervals with exponential backoff."""
+
+    def __init__(self, intervals=POLL_INTERVALS, backoff_factor=BACKOFF_FACTOR,
+                 burst_interval=BURST_INTERVAL, burst_polls=BURST_POLLS):
+        self.intervals = intervals
+        self.backoff_factor = backoff_factor
+        self.burst_interval = burst_interval
+        self.burst_polls = burst_polls
+        self.state = None
+        self.interval = None
+        self.burst_remaining = 0
+        self.last_status = None
+
+    def set_state(self, state):
+        """Enter state, resetting its backoff; return True if the state changed."""
+        if state == self.state:
+            return False
+        self.state = state
+        self.interval = self.intervals[state][0]
+        return True
+
+    def observe_status(self, status):
+        """Track drive status and start a fast-poll burst when the tray closes."""
+        if self.last_status == CDS_TRAY_OPEN and status != CDS_TRAY_OPEN:
+            self.burst_remaining = self.burst_polls
+        self.last_status = status
+
+    def next_interval(self):
+        """Return how long to wait before the next poll and back off the interval for the current state."""
+        if self.burst_remaining > 0:
+            self.burst_remaining -= 1
+            return self.burst_interval
+        interval = self.interval
+        self.interval = min(interval * self.backoff_factor, self.intervals[self.state][1])
+        return interval
@@ -0,0 +1,230 @@
+import re
+import sys
+import time
+from functools import lru_cache
+
+# Region mappings
+REGION_MAP = {
+    "USA": "NTSC-U",
+    "Europe": "PAL",
+    "Japan": "NTSC-J",
+    "Asia": "NTSC-J",
+    "Australia": "PAL",
+    "Brazil": "NTSC-U",
+    "Canada": "NTSC-U",
+    "China": "NTSC-J",
+    "France": "PAL",
+    "Germany": "PAL",
+    "Italy": "PAL",
+    "Korea": "NTSC-J",
+    "Netherlands": "PAL",
+    "Spain": "PAL",
+    "Sweden": "PAL",
+    "Taiwan": "NTSC-J",
+    "UK": "PAL",
+    "Russia": "PAL",
+    "Scandinavia": "PAL",
+    "Greece": "PAL",
+    "Finland": "PAL",
+    "Norway": "PAL",
+    "Ireland": "PAL",
+    "Portugal": "PAL",
+    "Austria": "PAL",
+    "Israel": "PAL",
+    "Poland": "PAL",
+    "Denmark": "PAL",
+    "Belgium": "PAL",
+    "India": "PAL",
+    "Latin America": "PAL",
+    "Croatia": "PAL",
+    "World": "NTSC-U",
+    "Switzerland": "PAL",
+    "South Africa": "PAL"
+}
+
+# Language mappings for explicit tags
+LANGUAGE_MAP = {
+    "En": "English",
+    "Ja": "Japanese",
+    "Fr": "French",
+    "De": "German",
+    "Es": "Spanish",
+    "It": "Italian",
+    "Nl": "Dutch",
+    "Pt": "Portuguese",
+    "Sv": "Swedish",
+    "No": "Norwegian",
+    "Da": "Danish",
+    "Fi": "Finnish",
+    "Zh": "Chinese",
+    "Ko": "Korean",
+    "Pl": "Polish",
+    "Ru": "Russian",
+    "El": "Greek",
+    "He": "Hebrew"
+}
+
+# Region-to-language mapping for all regions
+REGION_LANGUAGE_MAP = {
+    "USA": "English",
+    "Europe": "English",
+    "Japan": "Japanese",
+    "Asia": "English",
+    "Australia": "English",
+    "Brazil": "Portuguese",
+    "Canada": "English",
+    "China": "Chinese",
+    "France": "French",
+    "Germany": "German",
+    "Italy": "Italian",
+    "Korea": "Korean",
+    "Netherlands": "Dutch",
+    "Spain": "Spanish",
+    "Sweden": "Swedish",
+    "Taiwan": "Chinese",
+    "UK": "English",
+    "Russia": "Russian",
+    "Scandinavia": "English",
+    "Greece": "Greek",
+    "Finland": "Finnish",
+    "Norway": "Norwegian",
+    "Ireland": "English",
+    "Portugal": "Portuguese",
+    "Austria": "German",
+    "Israel": "Hebrew",
+    "Poland": "Polish",
+    "Denmark": "Danish",
+    "Belgium": "Dutch",
+    "India": "English",
+    "Latin America": "Spanish",
+    "Croatia": "Croatian",
+    "World": "English",
+    "Switzerland": "German",
+    "South Africa": "English"
+}
+
+# Parenthesized tag groups, e.g. "(Japan, Asia)" -> "Japan, Asia"
+TAG_GROUP_RE = re.compile(r'\(([^)]+)\)')
+# Explicit Redump language lists, e.g. "(En,Fr,De)"
+LANGUAGE_TAG_RE = re.compile(r'\((En?,(?:[A-Z][a-z]?,)*[A-Z][a-z]?)\)')
+# REGION_MAP keys lowercased once, in dict order so the first listed region still wins
+REGION_KEYS = [(map_region.lower(), map_region, db_region) for map_region, db_region in REGION_MAP.items()]
+
+@lru_cache(maxsize=None)
+def classify_region_token(token):
+    """Return (REGION_MAP key, db region) for the first region contained in one tag token, or None."""
+    lowered = token.lower()
+    for key, map_region, db_region in REGION_KEYS:
+        if key in lowered:
+            return map_region, db_region
+    return None
+
+@lru_cache(maxsize=4096)
+def classify_tags(tags):
+    """Classify a title's tag suffix (from its first "(") into (region, language), memoized per suffix."""
+    region = "Unknown"
+    language = "Unknown"
+    matched_region = None
+    
+    # Check for regions in parentheses (e.g., "Japan", "USA", "Japan, Asia")
+    for regions in TAG_GROUP_RE.findall(tags):
+        for r in regions.split(","):
+            match = classify_region_token(r.strip())
+            if match:
+                matched_region, region = match
+                break
+        if matched_region:
+            break
+    
+    # Check for language map, falling back to the region's language
+    lang_match = LANGUAGE_TAG_RE.search(tags)
+    if lang_match:
+        redump_langs = lang_match.group(1).split(",")
+        language = ", ".join(LANGUAGE_MAP.get(lang.strip(), lang.strip()) for lang in redump_langs)
+    elif matched_region in REGION_LANGUAGE_MAP:
+        language = REGION_LANGUAGE_MAP[matched_region]
+    
+    return region, language
+
+def extract_region_and_language(game_name):
+    """Extract region and language from game name."""
+    # Only the parenthesized tags matter, and titles share a small set of them ("(USA)", "(Europe) (En,Fr,De)")
+    start = game_name.find("(")
+    if start < 0:
+        return "Unknown", "Unknown"
+    return classify_tags(game_name[start:])
+
+def extract_region_and_language_reference(game_name):
+    """Original per-token scan over REGION_MAP, kept as the benchmark baseline and correctness reference."""
+    region = "Unknown"
+    language = "Unknown"
+    
+    # Check for regions in parentheses (e.g., "Japan", "USA", "Japan, Asia")
+    region_match = re.findall(r'\(([^)]+)\)', game_name)
+    matched_regions = []
+    if region_match:
+        for regions in region_match:
+            # Split multiple regions (e.g., "Japan, Asia" → ["Japan", "Asia"])
+            region_list = [r.strip() for r in regions.split(",")]
+            for r in region_list:
+                # Check if the region (or part of it) is in REGION_MAP
+                for map_region, db_region in REGION_MAP.items():
+                    if map_region.lower() in r.lower():
+                        region = db_region
+                        matched_regions.append(map_region)
+                        break
+                if region != "Unknown":
+                    break
+            if region != "Unknown":
+                break
+    
+    # Check for language map
+    lang_match = re.search(r'\((En?,(?:[A-Z][a-z]?,)*[A-Z][a-z]?)\)', game_name)
+    if lang_match:
+        redump_langs = lang_match.group(1).split(",")
+        db_langs = [LANGUAGE_MAP.get(lang.strip(), lang.strip()) for lang in redump_langs]
+        language = ", ".join(db_langs)
+    else:
+        # Region-based language mapping
+        for matched_region in matched_regions:
+            if matched_region in REGION_LANGUAGE_MAP:
+                language = REGION_LANGUAGE_MAP[matched_region]
+                break
+    
+    return region, language
+
+def benchmark(names, rounds=5):
+    """Time the classifier against the reference scan over a list of titles and check they agree."""
+    for name in names:
+        if extract_region_and_language(name) != extract_region_and_language_reference(name):
+            raise AssertionError(f"Classifier mismatch for {name!r}")
+    results = {}
+    for label, func in (("reference", extract_region_and_language_reference), ("classifier", extract_region_and_language)):
+        classify_tags.cache_clear()
+        classify_region_token.cache_clear()
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for name in names:
+                func(name)
+        results[label] = time.perf_counter() - start
+        print(f"{label}: {results[label] * 1000:.1f} ms for {rounds} x {len(names)} titles")
+    print(f"Speedup: {results['reference'] / results['classifier']:.1f}x")
+    return results
+
+if __name__ == "__main__":
+    # Usage: python3 -m core.utilities.regions [redump.dat]
+    if len(sys.argv) > 1:
+        import xml.etree.ElementTree as ET
+        titles = [game.get("name") for game in ET.parse(sys.argv[1]).getroot().iter("game")]
+    else:
+        titles = [
+            "Crash Bandicoot (USA)",
+            "Final Fantasy VII (Europe) (Disc 1)",
+            "Ridge Racer (Japan) (Rev 1)",
+            "Rayman (Europe) (En,Fr,De,Es,It,Nl)",
+            "Tekken 3 (Japan, Asia)",
+            "Gran Turismo 2 (USA) (Rev 1) (Arcade Disc)",
+            "Sonic CD (Europe) (En,Ja)",
+            "Untitled Prototype (2000-08-21)"
+        ] * 1000
+    benchmark(titles)
@@ -0,0 +1,219 @@
+import io
+import os
+import json
+import time
+import threading
+import multiprocessing
+from contextlib import redirect_stdout
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from core.utilities.catalog import normalize_serial
+from core.utilities.identify import identify_header, read_header
+from core.utilities.library import scan_directory
+from core.utilities.sectors import open_sectors, parse_cue_first_track
+
+CONTENT_INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../data/content_index.json")
+CONTENT_INDEX_VERSION = 1
+
+# Images whose contents are read; a .bin is reached through its .cue
+IMAGE_EXTENSIONS = (".chd", ".cue")
+
+# The MiSTer ARM has two cores; reading images is mostly decompression and parsing
+SCAN_WORKERS = 2
+
+# A serial that is not in the index starts a background rescan of changed images at most this often (seconds)
+RESCAN_INTERVAL = 60
+
+def log(message):
+    print(message)
+
+def read_image_serial(path):
+    """Read (system, serial) from a .cue/.bin or .chd image with the disc identifiers, or (None, None)."""
+    # Runs in pool workers; the identifiers' per-disc logging would interleave across images
+    with redirect_stdout(io.StringIO()):
+        try:
+            with open_sectors(path) as f:
+                return identify_header(read_header(f), f)
+        except Exception:
+            # Any failure (including a corrupt or half-copied image) only affects this image, not the scan
+            return None, None
+
+def image_stat(path):
+    """Return (size, mtime) of an image; for a .cue, of the cue and its data file together."""
+    stat = os.stat(path)
+    size, mtime = stat.st_size, stat.st_mtime
+    if path.lower().endswith(".cue"):
+        # A .bin still being copied must not leave the cue cached as unreadable
+        bin_path, _ = parse_cue_first_track(path)
+        if bin_path:
+            try:
+                bin_stat = os.stat(bin_path)
+                size, mtime = size + bin_stat.st_size, max(mtime, bin_stat.st_mtime)
+            except OSError:
+                pass
+    return size, mtime
+
+def list_images(roots, library=None):
+    """Return [(system, path)] for every .chd and .cue under roots, from the library index when given."""
+    images = []
+    if library is not None:
+        with library.lock:
+            for directory, info in library.dirs.items():
+                images.extend((info["system"], os.path.join(directory, name))
+                              for name in info["files"] if name.lower().endswith(IMAGE_EXTENSIONS))
+        return images
+    for system, paths in roots.items():
+        stack = list(paths)
+        while stack:
+            directory = stack.pop()
+            try:
+                subdirs, files = scan_directory(directory)
+            except OSError:
+                continue
+            stack.extend(subdirs)
+            images.extend((system, os.path.join(directory, name))
+                          for name in files if name.lower().endswith(IMAGE_EXTENSIONS))
+    return images
+
+def image_rank(path):
+    """Sort key choosing between local images of the same disc: .chd first, then by path."""
+    return (not path.lower().endswith(".chd"), path)
+
+class ContentIndex:
+    """Persistent map of local images to the serial read from their contents, cached by (path, size, mtime)."""
+
+    def __init__(self, roots, library=None, path=CONTENT_INDEX_PATH, workers=SCAN_WORKERS):
+        self.roots = roots
+        self.library = library
+        self.path = path
+        self.workers = workers
+        self.lock = threading.RLock()
+        self.scan_lock = threading.Lock()
+        self.images = {}   # path -> {"system", "size", "mtime", "serial"}; serial is None for unrecognised images
+        self.serials = {}  # (system, normalized serial) -> path
+        self.last_scan = 0
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            log(f"Ignoring unreadable content index {self.path}: {e}")
+            return
+        if data.get("version") == CONTENT_INDEX_VERSION:
+            self.images = data.get("images", {})
+            self.rebuild_serials()
+
+    def save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temp_path = self.path + ".tmp"
+            with open(temp_path, "w") as f:
+                json.dump({"version": CONTENT_INDEX_VERSION, "images": self.images}, f)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            log(f"Error saving content index {self.path}: {e}")
+
+    def rebuild_serials(self):
+        serials = {}
+        for path, info in self.images.items():
+            if not info["serial"]:
+                continue
+            key = (info["system"], normalize_serial(info["serial"]))
+            if key not in serials or image_rank(path) < image_rank(serials[key]):
+                serials[key] = path
+        self.serials = serials
+
+    def scan(self):
+        """Read serials from new or changed images across a process pool; return the number of images read.
+
+        Returns None without scanning if another scan is already running.
+        """
+        if not self.scan_lock.acquire(blocking=False):
+            return None
+        try:
+            images = {}
+            pending = []
+            for system, path in list_images(self.roots, self.library):
+                try:
+                    size, mtime = image_stat(path)
+                except OSError:
+                    continue
+                cached = self.images.get(path)
+                if cached and cached["system"] == system and cached["size"] == size and cached["mtime"] == mtime:
+                    images[path] = cached
+                    continue
+                images[path] = {"system": system, "size": size, "mtime": mtime, "serial": None}
+                pending.append(path)
+
+            if pending:
+                log(f"Reading serials from {len(pending)} local images...")
+                # forkserver keeps the workers from inheriting the drive and watcher threads' locks
+                context = multiprocessing.get_context("forkserver")
+                unread = set(pending)
+                try:
+                    with ProcessPoolExecutor(max_workers=self.workers, mp_context=context) as pool:
+                        for path, (system, serial) in zip(pending, pool.map(read_image_serial, pending)):
+                            unread.discard(path)
+                            # Unreadable images and images in another system's folder stay in the index without a serial
+                            if system == images[path]["system"]:
+                                images[path]["serial"] = serial
+                except (OSError, BrokenProcessPool) as e:
+                    # Images that were not read are left out so the next scan retries them
+                    log(f"Error reading local images: {e}")
+                    for path in unread:
+                        del images[path]
+                    pending = [path for path in pending if path not in unread]
+
+            with self.lock:
+                removed = len(self.images.keys() - images.keys())
+                self.images = images
+                self.last_scan = time.time()
+                if pending or removed:
+                    self.rebuild_serials()
+                    self.save()
+                    log(f"Content index: {len(self.serials)} serials in {len(images)} images, "
+                        f"{len(pending)} read, {removed} removed")
+            return len(pending)
+        finally:
+            self.scan_lock.release()
+
+    def lookup(self, system, serial):
+        with self.lock:
+            path = self.serials.get((system, normalize_serial(serial)))
+        return path if path and os.path.exists(path) else None
+
+    def find(self, system, serial):
+        """Return the local image whose contents carry serial, or None.
+
+        A miss on a stale index starts a background rescan for later discs; this lookup does not wait for it,
+        since it runs on the launch path.
+        """
+        path = self.lookup(system, serial)
+        if path is None and time.time() - self.last_scan > RESCAN_INTERVAL and not self.scan_lock.locked():
+            self.start()
+        return path
+
+    def start(self):
+        """Scan in a daemon thread so startup and the first disc are not held up by a large library."""
+        def run():
+            try:
+                self.scan()
+            except Exception as e:
+                log(f"Content index scan failed: {e}")
+        threading.Thread(target=run, name="content-index", daemon=True).start()
+        return self
+
+def serial_game_finder(index, serial, find_game_file):
+    """Wrap find_game_file so a local image with the disc's serial is used before any title matching."""
+    def find(title, system):
+        if index is not None and serial:
+            game_file = index.find(system, serial)
+            if game_file:
+                print(f"Found game file by serial {serial}: {game_file}")
+                return game_file
+        return find_game_file(title, system)
+    return find
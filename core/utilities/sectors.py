@@ -0,0 +1,139 @@
+import os
+import re
+from core.utilities.chd import ChdCdFile
+
+USER_DATA_SIZE = 2048
+RAW_SECTOR_SIZE = 2352
+
+# Every raw data sector starts with this 12-byte sync pattern, followed by a 4-byte header whose last byte is the mode
+SYNC_PATTERN = b"\x00" + b"\xff" * 10 + b"\x00"
+
+# Sector layouts: name -> (bytes per sector, offset of the 2048 bytes of user data)
+COOKED = "cooked"
+MODE1_2352 = "MODE1/2352"
+MODE2_2352 = "MODE2/2352"
+MODE2_2336 = "MODE2/2336"
+CHD_2048 = "CHD/2048"
+SECTOR_FORMATS = {
+    COOKED: (USER_DATA_SIZE, 0),
+    "MODE1/2048": (USER_DATA_SIZE, 0),
+    MODE1_2352: (RAW_SECTOR_SIZE, 16),   # sync + header
+    MODE2_2352: (RAW_SECTOR_SIZE, 24),   # sync + header + XA subheader (form 1)
+    MODE2_2336: (2336, 8),               # XA subheader only
+    CHD_2048: (RAW_SECTOR_SIZE, 0)       # chdman pads MODE1/2048 tracks to 2352-byte frames
+}
+
+CUE_FILE_RE = re.compile(r'^\s*FILE\s+"?(.+?)"?\s+\w+\s*$', re.IGNORECASE)
+CUE_TRACK_RE = re.compile(r'^\s*TRACK\s+\d+\s+(\S+)', re.IGNORECASE)
+
+def detect_sector_format(header):
+    """Detect the sector layout from the first bytes of a device or image by looking for a raw sync header."""
+    if len(header) >= 16 and header[:12] == SYNC_PATTERN:
+        return MODE2_2352 if header[15] == 2 else MODE1_2352
+    return COOKED
+
+def parse_cue_first_track(cue_path):
+    """Return (bin path, sector format) of the first track in a cue sheet, or (None, None) if it has none."""
+    bin_path = None
+    with open(cue_path, "r", encoding="latin-1") as f:
+        for line in f:
+            file_match = CUE_FILE_RE.match(line)
+            if file_match:
+                bin_path = os.path.join(os.path.dirname(cue_path), file_match.group(1))
+                continue
+            track_match = CUE_TRACK_RE.match(line)
+            if track_match and bin_path:
+                mode = track_match.group(1).upper()
+                return bin_path, mode if mode in SECTOR_FORMATS else None
+    return bin_path, None
+
+class SectorReader:
+    """File-like view of the 2048-byte user data of a cooked device, ISO, or raw MODE1/MODE2 image.
+
+    seek() and read() address user data as if the source were a cooked 2048-byte image, so the header
+    identifiers and the ISO9660 reader work unchanged on raw .bin files.
+    """
+
+    def __init__(self, f, sector_format=None):
+        self.f = f
+        if sector_format is None:
+            f.seek(0)
+            sector_format = detect_sector_format(f.read(RAW_SECTOR_SIZE))
+        self.sector_format = sector_format
+        self.sector_size, self.data_offset = SECTOR_FORMATS[sector_format]
+        self.pos = 0
+
+    @property
+    def is_raw(self):
+        return self.sector_size != USER_DATA_SIZE
+
+    def fileno(self):
+        return self.f.fileno()
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self.pos
+        elif whence == os.SEEK_END:
+            offset += self.sector_count() * USER_DATA_SIZE
+        self.pos = max(offset, 0)
+        return self.pos
+
+    def tell(self):
+        return self.pos
+
+    def read_sector(self, lba, count=1):
+        """Return the user data of count sectors starting at lba (shorter at the end of the image)."""
+        if not self.is_raw:
+            self.f.seek(lba * USER_DATA_SIZE)
+            return self.f.read(count * USER_DATA_SIZE)
+        self.f.seek(lba * self.sector_size)
+        raw = self.f.read(count * self.sector_size)
+        start = self.data_offset
+        return b"".join(raw[i + start:i + start + USER_DATA_SIZE]
+                        for i in range(0, len(raw) - start, self.sector_size))
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = max(self.sector_count() * USER_DATA_SIZE - self.pos, 0)
+        if size == 0:
+            return b""
+        first = self.pos // USER_DATA_SIZE
+        last = (self.pos + size - 1) // USER_DATA_SIZE
+        skip = self.pos - first * USER_DATA_SIZE
+        data = self.read_sector(first, last - first + 1)[skip:skip + size]
+        self.pos += len(data)
+        return data
+
+    def sector_count(self):
+        """Return the number of sectors in an image file, or None for devices without a size."""
+        size = getattr(self.f, "size", None)
+        if size is None:
+            try:
+                size = os.fstat(self.f.fileno()).st_size
+            except (OSError, AttributeError, ValueError):
+                return None
+        return size // self.sector_size if size else None
+
+    def close(self):
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def open_sectors(path, sector_format=None):
+    """Open a device, .iso, .bin, .cue or .chd (first track) as a SectorReader, detecting raw sectors when not given."""
+    if path.lower().endswith(".chd"):
+        f = ChdCdFile(path)
+        if sector_format is None and detect_sector_format(f.read(RAW_SECTOR_SIZE)) == COOKED:
+            sector_format = CHD_2048
+        return SectorReader(f, sector_format)
+    if path.lower().endswith(".cue"):
+        bin_path, cue_format = parse_cue_first_track(path)
+        if not bin_path:
+            raise OSError(f"No FILE entry in cue sheet {path}")
+        path = bin_path
+        sector_format = sector_format or cue_format
+    return SectorReader(open(path, "rb"), sector_format)
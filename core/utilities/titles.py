@@ -0,0 +1,50 @@
+import re
+import unicodedata
+from functools import lru_cache
+
+# Characters that cannot appear in MiSTer file names or MGL paths
+UNSAFE_CHARS_RE = re.compile(r'[<>:"/\\|?*]')
+
+# Tags clean_game_title strips from the end of a title, applied in this order
+CLEAN_TITLE_RES = [
+    # Language tags (e.g., (En,Fr,De,Es,It), (Ja))
+    re.compile(r'\s*\((?:En|Fr|De|Es|It|Ja|Ko|Zh)(?:,[A-Za-z]+)*\)\s*$', re.IGNORECASE),
+    # (Beta)
+    re.compile(r'\s*\(Beta\)\s*$', re.IGNORECASE),
+    # (Rev <number>) (e.g., (Rev 1), (Rev 123))
+    re.compile(r'\s*\(Rev\s+\d+\)\s*$', re.IGNORECASE),
+    # Date tags (e.g., (2000-08-21))
+    re.compile(r'\s*\(\d{4}-\d{2}-\d{2}\)\s*$'),
+    # Malformed or incomplete tags (e.g., (Rev, (, (USA)
+    re.compile(r'\s*\([^\)]*?\s*$')
+]
+
+NON_ALNUM_RE = re.compile(r'[^0-9a-z]+')
+
+TITLE_KEY_CACHE_SIZE = 8192
+
+def sanitize_title(title):
+    """Remove characters that are unsafe in file names (keep parentheses, spaces, hyphens)."""
+    return UNSAFE_CHARS_RE.sub('', title).strip()
+
+@lru_cache(maxsize=TITLE_KEY_CACHE_SIZE)
+def clean_game_title(title):
+    """Remove language mappings, (Beta), (Rev *), dates, and malformed tags from the title, preserving region."""
+    cleaned = title
+    for pattern in CLEAN_TITLE_RES:
+        cleaned = pattern.sub('', cleaned)
+    return cleaned.strip()
+
+@lru_cache(maxsize=TITLE_KEY_CACHE_SIZE)
+def fold_title(title):
+    """Case, accent and punctuation-insensitive key: "Tomb Raider - Chronicles (USA)" -> "tomb raider chronicles usa"."""
+    decomposed = unicodedata.normalize("NFKD", title)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return NON_ALNUM_RE.sub(' ', stripped.casefold()).strip()
+
+@lru_cache(maxsize=TITLE_KEY_CACHE_SIZE)
+def title_keys(title):
+    """Return (sanitized title, cleaned title, folded title key) as stored in the games table."""
+    sanitized = sanitize_title(title)
+    cleaned = sanitize_title(clean_game_title(title))
+    return sanitized, cleaned, fold_title(sanitized)
@@ -1,162 +1,318 @@
 import os
 import time
-import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from core.utilities.core import find_cores
-from core.utilities.database import load_game_titles
-from core.utilities.disc import get_optical_drive, is_disc_present, read_saturn_game_id, read_mcd_game_id, read_psx_game_id
+from core.utilities.catalog import open_catalog, find_matches, DB_SYSTEM_CODES
+from core.utilities.database import get_db_path
+from core.utilities.identify import identify_disc
+from core.utilities.iso9660 import IsoError
+from core.utilities.fingerprint import DiscCache, read_disc_fingerprint, cached_game_finder
+from core.utilities.drives import DriveWatcher
+from core.utilities.media import MediaMonitor, CDS_DISC_OK
+from core.utilities.poller import AdaptivePoller, state_for_status, IDENTIFIED, GAME_RUNNING
 from core.utilities.ui import show_popup, select_game_title
 from core.utilities.launcher import launch_game_on_mister
-from core.utilities.files import find_game_file
+from core.utilities.scanner import serial_game_finder
+from core.utilities.files import (find_game_file, watch_game_library, scan_game_images, USE_LIBRARY_INDEX,
+                                  USE_CONTENT_INDEX)
+
+# Which disc launches when several drives have one: "latest" lets the most recent insertion replace the
+# running game, "first" keeps the running game until its disc is removed
+LAUNCH_POLICY = os.environ.get("RETROSPIN_LAUNCH_POLICY", "latest")
+
+# Upper bound on drives identified concurrently (one worker thread per drive)
+MAX_DRIVES = 4
+
+# Display names used in log messages and title dialogs
+SYSTEM_LABELS = {
+    "psx": "PSX",
+    "saturn": "Saturn",
+    "megacd": "Mega CD"
+}
+
+class LaunchPolicy:
+    """Decides which drive's disc launches when several drives identify games, and serializes launches."""
+
+    def __init__(self, policy=LAUNCH_POLICY):
+        self.policy = policy
+        # Guards the policy decision and active drive only; release() never waits for a launch
+        self.lock = threading.Lock()
+        # Serializes launches, which can include a disc rip lasting minutes
+        self.launch_lock = threading.Lock()
+        self.active_drive = None
+        self.active_inserted_at = 0
+
+    def launch(self, drive_path, inserted_at, launch):
+        """Run launch() if the policy allows this insertion; return True if it ran."""
+        with self.lock:
+            if self.active_drive and self.active_drive != drive_path:
+                if self.policy == "first":
+                    print(f"Game from {self.active_drive} is still inserted; not launching disc in {drive_path}")
+                    return False
+                if inserted_at < self.active_inserted_at:
+                    # A slower identification of an older insertion must not replace a newer game
+                    print(f"Newer disc already launched from {self.active_drive}; not launching disc in {drive_path}")
+                    return False
+            self.active_drive = drive_path
+            self.active_inserted_at = inserted_at
+        with self.launch_lock:
+            with self.lock:
+                # A newer insertion or a removal while this launch waited its turn supersedes it
+                if self.active_drive != drive_path or self.active_inserted_at != inserted_at:
+                    print(f"Disc in {drive_path} was superseded before it launched")
+                    return False
+            launch()
+            return True
+
+    def release(self, drive_path):
+        """Forget the running game when its disc or drive goes away."""
+        with self.lock:
+            if self.active_drive == drive_path:
+                self.active_drive = None
+                self.active_inserted_at = 0
+
+class ServiceContext:
+    """State shared by all drive workers."""
+
+    def __init__(self, catalog, available_cores, disc_cache, catalog_mtime, policy, content_index=None):
+        self.catalog = catalog
+        self.available_cores = available_cores
+        self.disc_cache = disc_cache
+        self.catalog_mtime = catalog_mtime
+        self.policy = policy
+        self.content_index = content_index
+        # Title dialogs share one terminal
+        self.ui_lock = threading.Lock()
+
+class DriveWorker:
+    """Polls one drive and identifies and launches its discs, independently of any other drive."""
+
+    def __init__(self, drive_path, context):
+        self.drive_path = drive_path
+        self.context = context
+        # CDROM ioctls report tray/disc state without reading from (and spinning) the disc
+        self.media = MediaMonitor()
+        # Per-state poll intervals with backoff instead of a fixed one second sleep
+        self.poller = AdaptivePoller()
+        self.wakeup = threading.Event()
+        self.stopped = threading.Event()
+        self.media_changed = False
+        self.last_game_serial = None
+        self.identified = False
+
+    def notify_change(self):
+        """Called from the watcher thread when a uevent reports a media change on this drive."""
+        self.media_changed = True
+        self.wakeup.set()
+
+    def stop(self):
+        self.stopped.set()
+        self.wakeup.set()
+
+    def wait(self):
+        self.wakeup.wait(self.poller.next_interval())
+        self.wakeup.clear()
+
+    def run(self):
+        print(f"Watching drive {self.drive_path}")
+        try:
+            while not self.stopped.is_set():
+                self.poll_once()
+                self.wait()
+        except Exception as e:
+            print(f"Drive worker for {self.drive_path} failed: {e}")
+        finally:
+            self.context.policy.release(self.drive_path)
+            self.media.close()
+            print(f"Stopped watching drive {self.drive_path}")
+
+    def poll_once(self):
+        status, changed = self.media.poll(self.drive_path)
+        self.poller.observe_status(status)
+        if self.media_changed and status == CDS_DISC_OK:
+            changed = True
+        self.media_changed = False
+
+        if status != CDS_DISC_OK:
+            if self.identified:
+                self.context.policy.release(self.drive_path)
+            self.poller.set_state(state_for_status(status))
+            self.last_game_serial = None
+            self.identified = False
+            return
+        if self.identified and not changed:
+            # Same disc as last identification; only a media change triggers another read
+            return
+        self.poller.set_state(IDENTIFIED)
+        try:
+            launched = self.identify_and_launch(time.time())
+        except Exception as e:
+            # Leave the disc unidentified so the next poll tries again
+            print(f"Error identifying disc in {self.drive_path}: {e}")
+            return
+        if launched is None:
+            # The disc could not be read; try again on the next poll
+            return
+        self.identified = True
+        if launched:
+            self.poller.set_state(GAME_RUNNING)
+
+    def identify_and_launch(self, inserted_at):
+        """Identify the disc in the drive and launch it if the policy allows.
+
+        Returns True if launched, False if not, and None if the disc could not be read and should be retried.
+        """
+        context = self.context
+        drive_path = self.drive_path
+        print(f"Checking drive {drive_path}...")
+
+        fingerprint, header = read_disc_fingerprint(drive_path)
+        cached = context.disc_cache.get(fingerprint, context.catalog_mtime)
+        if cached:
+            if not cached["title"]:
+                print(f"Known disc with no database match ({cached['system']} {cached['serial']}). Skipping.")
+                return False
+            print(f"Known disc: {cached['title']} ({cached['serial']})")
+            self.last_game_serial = (cached["serial"], cached["system"])
+            return self.launch(cached["serial"], cached["title"], cached["system"], inserted_at, fingerprint)
+
+        # Read the header sectors once and dispatch to the matching system's parser
+        try:
+            system, game_serial = identify_disc(drive_path, header)
+        except (OSError, IsoError) as e:
+            print(f"Error reading disc in {drive_path}: {e}")
+            return None
+        if system not in SYSTEM_LABELS:
+            print(f"No game detected in {drive_path}. Waiting for a different disc...")
+            # Only a disc with no known signature is remembered as unrecognised
+            context.disc_cache.record(fingerprint, system, game_serial)
+            return False
+        if not game_serial:
+            # The signature matched, so a missing serial may be a bad read; it is not cached
+            print(f"No serial found on {SYSTEM_LABELS[system]} disc in {drive_path}. Waiting for a different disc...")
+            return False
+
+        label = SYSTEM_LABELS[system]
+        serial_key = game_serial.replace("_", "").upper()
+        print(f"Looking up {label} serial: {serial_key}")
+        # Per-system exact, alias and partial matching lives in find_matches
+        matches = find_matches(context.catalog, system, game_serial)
+        print(f"{label} matches found: {len(matches)}")
+        self.last_game_serial = (game_serial, system)
+        if not matches:
+            print(f"No database match for {label} serial {game_serial}. Skipping.")
+            context.disc_cache.record(fingerprint, system, game_serial)
+            return False
+
+        if len(matches) == 1:
+            title = matches[0][1]
+        else:
+            with context.ui_lock:
+                title = select_game_title(matches, label, serial_key)
+        print(f"Found {label} game: {title} ({game_serial})")
+        # PSX launches unmatched titles under a generic name; other systems skip them
+        if title == "Unknown Game" and system != "psx":
+            print(f"No valid match for {game_serial}. Skipping.")
+            context.disc_cache.record(fingerprint, system, game_serial)
+            return False
+        context.disc_cache.record(fingerprint, system, game_serial, title)
+        return self.launch(game_serial, title, system, inserted_at, fingerprint, matches)
+
+    def stored_title_keys(self, system, game_serial, title, matches=None):
+        """Return the title keys the catalog stored for the chosen match, or None to derive them from the title."""
+        if title == "Unknown Game":
+            # The launcher searches for a generic name instead of this title
+            return None
+        if matches is None:
+            matches = find_matches(self.context.catalog, system, game_serial)
+        code = DB_SYSTEM_CODES.get(system, system)
+        for serial, match_title in matches:
+            if match_title == title:
+                return self.context.catalog.title_keys(code, serial, title)
+        return None
+
+    def launch(self, game_serial, title, system, inserted_at, fingerprint, matches=None):
+        core = self.context.available_cores.get(system)
+        if not core:
+            print(f"No {SYSTEM_LABELS.get(system, system)} core available to launch game")
+            return False
+        keys = self.stored_title_keys(system, game_serial, title, matches)
+        # A local image carrying the disc's serial wins over title matching, whatever the file is named
+        game_finder = cached_game_finder(self.context.disc_cache, fingerprint, serial_game_finder(
+            self.context.content_index, game_serial, lambda title, system: find_game_file(title, system, keys)))
+        return self.context.policy.launch(self.drive_path, inserted_at, lambda: launch_game_on_mister(
+            game_serial, title, core, system, self.drive_path, game_finder))
 
 def main():
     # Log terminal environment
     print(f"Terminal environment: TERM={os.environ.get('TERM', 'unset')}, TTY={os.ttyname(0) if os.isatty(0) else 'none'}")
-    
+
     print("Starting RetroSpin disc launcher on MiSTer...")
-    game_titles = load_game_titles()
-    
+    catalog = open_catalog()
+
+    # Known discs (including unmatched ones) skip identification, lookup and title dialogs
+    disc_cache = DiscCache()
+    db_path = get_db_path()
+    catalog_mtime = os.path.getmtime(db_path) if os.path.exists(db_path) else 0
+
     # Define supported systems (full names for cores, but use DB-normalized keys for lookups)
     supported_systems = ["psx", "saturn", "megacd", "neogeo", "cdi", "tgcd"]
-    
+
     # Find all available cores once
     available_cores = find_cores(supported_systems)
     
+    # Index the game folders once; inotify keeps the index current so launches never walk the tree
+    if USE_LIBRARY_INDEX:
+        watch_game_library()
+
+    # Read serials out of local images in the background so renamed files still match their discs
+    content_index = scan_game_images() if USE_CONTENT_INDEX else None
+
     # Check for core support
     #if not any(available_cores.get(system) for system in supported_systems):
         #show_popup("No supported CD-ROM cores (PSX, Saturn, or Mega CD) found in /media/fat/_Console/.")
         #print("Cannot proceed without supported cores. Exiting...")
         #return
-    
-    last_game_serial = None
-    last_drive_path = None
-    
-    while True:
-        drive_path = get_optical_drive()
-        
-        # Check if drive is accessible and disc is present
-        if drive_path and is_disc_present(drive_path):
-            if last_game_serial and drive_path == last_drive_path:
-                print(f"Same game already loaded: {last_game_serial}. Waiting for drive to open...")
-                time.sleep(1)
-                continue
-            
-            print(f"Checking drive {drive_path}...")
-            
-            # Try Saturn
-            saturn_game_serial = read_saturn_game_id(drive_path)
-            if saturn_game_serial is not None:
-                serial_key = saturn_game_serial.upper()
-                print(f"Looking up Saturn serial: {serial_key}")
-                matches = []
-                # Check for exact and partial matches (using DB-normalized "ss")
-                for (db_serial, db_system), titles in game_titles.items():                    
-                    if db_system == "ss" and (db_serial == serial_key or db_serial.startswith(serial_key)):
-                        matches.extend(titles)
-                print(f"Saturn matches found: {len(matches)}")
-                if matches:
-                    if len(matches) == 1:
-                        title = matches[0][1]
-                    else:
-                        title = select_game_title(matches, "Saturn", serial_key)
-                    print(f"Found Saturn game: {title} ({saturn_game_serial})")
-                    saturn_core = available_cores.get("saturn")
-                    if saturn_core and title != "Unknown Game":
-                        launch_game_on_mister(saturn_game_serial, title, saturn_core, "saturn", drive_path, find_game_file)
-                    else:
-                        print(f"No Saturn core or no valid match for {saturn_game_serial}. Skipping.")
-                else:
-                    print(f"No database match for Saturn serial {saturn_game_serial}. Skipping.")
-                last_game_serial = (saturn_game_serial, "saturn")
-                last_drive_path = drive_path
-                #time.sleep(1)
-                continue
-            
-            # Try Sega CD (Mega CD)
-            mcd_game_serial = read_mcd_game_id(drive_path)
-            if mcd_game_serial is not None:
-                serial_key = mcd_game_serial.upper()
-                us_serial_key = serial_key.replace("-00","") #unique case
-                print(f"Looking up Mega CD serial: {serial_key}")
-                matches = []
-                # Check for exact and partial matches (using DB-normalized "mcd")
-                for (db_serial, db_system), titles in game_titles.items():
-                    if db_system == "mcd" and (db_serial == serial_key or db_serial == us_serial_key):
-                        matches.extend(titles)
-                        break
-                    else:
-                        if db_serial.startswith(serial_key):
-                            matches.extend(titles)
-
-                print(f"Mega CD matches found: {len(matches)}")
-                if matches:
-                    if len(matches) == 1:
-                        title = matches[0][1]
-                    else:
-                        title = select_game_title(matches, "Mega CD", serial_key)
-                    print(f"Found Mega CD game: {title} ({mcd_game_serial})")
-                    mcd_core = available_cores.get("megacd")
-                    if mcd_core and title != "Unknown Game":
-                        launch_game_on_mister(mcd_game_serial, title, mcd_core, "megacd", drive_path, find_game_file)
-                    else:
-                        print(f"No Mega CD core or no valid match for {mcd_game_serial}. Skipping.")
-                else:
-                    print(f"No database match for Mega CD serial {mcd_game_serial}. Skipping.")
-                last_game_serial = (mcd_game_serial, "megacd")
-                last_drive_path = drive_path
-                #time.sleep(1)
-                continue
-            
-            # Try PSX
-            for attempt in range(2):
-                psx_game_serial = read_psx_game_id(drive_path)
-                if psx_game_serial:
-                    break
-                print(f"PSX read attempt {attempt + 1} failed, retrying after delay...")
-                time.sleep(1)
-                os.system(f"umount /mnt/cdrom 2>/dev/null")  # Force unmount
-            if psx_game_serial:
-                serial_key = psx_game_serial.replace("_", "").upper()
-                print(f"Looking up PSX serial: {serial_key}")
-                matches = []
-                # Check for exact and partial matches
-                for (db_serial, db_system), titles in game_titles.items():
-                    if db_system == "psx" and (db_serial == serial_key):
-                        matches.extend(titles)
-                        break
-                    else:
-                        if db_serial.startswith(serial_key):
-                            matches.extend(titles)
-                print(f"PSX matches found: {len(matches)}")
-                if matches:
-                    if len(matches) == 1:
-                        title = matches[0][1]
-                    else:
-                        title = select_game_title(matches, "PSX", serial_key)
-                    print(f"Found PSX game: {title} ({psx_game_serial})")
-                    psx_core = available_cores.get("psx")
-                    if psx_core:
-                        launch_game_on_mister(psx_game_serial, title, psx_core, "psx", drive_path, find_game_file)
-                    else:
-                        print("No PSX core available to launch game")
-                else:
-                    print(f"No database match for PSX serial {psx_game_serial}. Skipping.")
-                last_game_serial = (psx_game_serial, "psx")
-                last_drive_path = drive_path
-                time.sleep(1)
-                continue
-            
-            print("No game detected. Waiting...")
-            last_game_serial = None
-            last_drive_path = None
-        else:
-            print("No optical drive or disc detected. Waiting...")
-            last_game_serial = None
-            last_drive_path = None
-        
-        time.sleep(1)
+
+    context = ServiceContext(catalog, available_cores, disc_cache, catalog_mtime, LaunchPolicy(), content_index)
+
+    # Drive hotplug and media-change events replace spawning lsblk on every iteration
+    watcher = DriveWatcher()
+    executor = ThreadPoolExecutor(max_workers=MAX_DRIVES)
+    workers = {}
+    had_drives = None
+
+    try:
+        while True:
+            drives = watcher.current_drives()
+            for drive_path in list(workers):
+                if drive_path not in drives:
+                    workers.pop(drive_path).stop()
+            for drive_path in drives:
+                if drive_path in workers:
+                    continue
+                if len(workers) >= MAX_DRIVES:
+                    print(f"Ignoring {drive_path}: already watching {MAX_DRIVES} drives")
+                    continue
+                worker = DriveWorker(drive_path, context)
+                workers[drive_path] = worker
+                executor.submit(worker.run)
+            if not workers and had_drives is not False:
+                print("No optical drive detected. Waiting for one to be connected...")
+            had_drives = bool(workers)
+
+            # Block until a drive is added or removed, handing media-change uevents to the drive's worker
+            for drive_path in watcher.wait():
+                if drive_path in workers:
+                    workers[drive_path].notify_change()
+    finally:
+        for worker in workers.values():
+            worker.stop()
+        executor.shutdown(wait=False)
 
 if __name__ == "__main__":
     try:
         main()
     except KeyboardInterrupt:
-        print("\nScript stopped by user. Exiting...")
\ No newline at end of file
+        print("\nScript stopped by user. Exiting...")